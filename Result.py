@@ -1,55 +1,209 @@
+import math
+from collections import OrderedDict
+
 import numpy as np
-from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QFileDialog, QMenu, QSizePolicy
-from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFileDialog, QMenu, QSizePolicy, QActionGroup
+from PyQt5.QtGui import QPixmap, QImage, QPainter
+from PyQt5.QtCore import Qt, QPointF, QRectF
 import cv2
 import os
+from video_thread import ImageSaveThread
+
+# File dialog filter -> extension. PNG and TIFF keep the image's bit depth.
+SAVE_FORMATS = {
+    "PNG Files (*.png)": ".png",
+    "WebP lossless (*.webp)": ".webp",
+    "TIFF Files (*.tiff)": ".tiff",
+}
+PNG_COMPRESSION_LEVELS = (("Fastest save", 1), ("Default", 3), ("Smallest file", 9))
+
+
+class TiledImageView(QWidget):
+    """
+    Zoomable, pannable view of a large BGR image.
+
+    The image is kept as a pyramid of half-size levels cut into tiles, and only
+    the tiles visible at the current zoom are converted to pixmaps, so memory
+    and paint cost depend on the window size rather than the image size.
+    Scroll to zoom around the cursor, drag to pan, double-click to fit.
+    """
+
+    TILE_SIZE = 256
+    MAX_CACHED_TILES = 256
+    MAX_ZOOM = 16.0
+
+    def __init__(self, image=None, parent=None):
+        super().__init__(parent)
+        self.levels = []
+        self.zoom = 1.0
+        self.origin = QPointF(0, 0)  # image coordinates shown at the top-left corner
+        self.fitted = True
+        self._tiles = OrderedDict()
+        self._drag_start = None
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        if image is not None:
+            self.set_image(image)
+
+    def set_image(self, image):
+        """Build the pyramid for a new image and fit it to the view."""
+        self.levels = [np.ascontiguousarray(image)]
+        while max(self.levels[-1].shape[:2]) > self.TILE_SIZE:
+            height, width = self.levels[-1].shape[:2]
+            self.levels.append(cv2.resize(self.levels[-1], ((width + 1) // 2, (height + 1) // 2),
+                                          interpolation=cv2.INTER_AREA))
+        self._tiles.clear()
+        self.fit_to_view()
+
+    def image_size(self):
+        height, width = self.levels[0].shape[:2]
+        return width, height
+
+    def fit_to_view(self):
+        if not self.levels:
+            return
+        width, height = self.image_size()
+        self.zoom = min(self.width() / width, self.height() / height) or 1.0
+        # Centre the image in the view
+        self.origin = QPointF((width - self.width() / self.zoom) / 2, (height - self.height() / self.zoom) / 2)
+        self.fitted = True
+        self.update()
+
+    def level_for_zoom(self, zoom):
+        """Return the coarsest pyramid level that still has at least one pixel per screen pixel."""
+        if zoom >= 1:
+            return 0
+        return min(len(self.levels) - 1, int(math.floor(math.log2(1 / zoom))))
+
+    def tile_pixmap(self, level, tile_x, tile_y):
+        key = (level, tile_x, tile_y)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+        size = self.TILE_SIZE
+        tile = np.ascontiguousarray(self.levels[level][tile_y * size:(tile_y + 1) * size,
+                                                       tile_x * size:(tile_x + 1) * size])
+        height, width = tile.shape[:2]
+        q_img = QImage(tile.data, width, height, tile.strides[0], QImage.Format_BGR888)
+        pixmap = QPixmap.fromImage(q_img)
+        self._tiles[key] = pixmap
+        if len(self._tiles) > self.MAX_CACHED_TILES:
+            self._tiles.popitem(last=False)
+        return pixmap
+
+    def visible_tiles(self):
+        """Return (level, tile_x, tile_y) for every tile intersecting the view."""
+        level = self.level_for_zoom(self.zoom)
+        span = self.TILE_SIZE * (1 << level)  # image pixels covered by one tile
+        width, height = self.image_size()
+        x0 = max(0, self.origin.x())
+        y0 = max(0, self.origin.y())
+        x1 = min(width, self.origin.x() + self.width() / self.zoom)
+        y1 = min(height, self.origin.y() + self.height() / self.zoom)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        return [(level, tx, ty)
+                for ty in range(int(y0 // span), int(math.ceil(y1 / span)))
+                for tx in range(int(x0 // span), int(math.ceil(x1 / span)))]
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if not self.levels:
+            painter.end()
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for level, tile_x, tile_y in self.visible_tiles():
+            pixmap = self.tile_pixmap(level, tile_x, tile_y)
+            scale = (1 << level) * self.zoom  # screen pixels per level pixel
+            span = self.TILE_SIZE * (1 << level)
+            target = QRectF((tile_x * span - self.origin.x()) * self.zoom,
+                            (tile_y * span - self.origin.y()) * self.zoom,
+                            pixmap.width() * scale, pixmap.height() * scale)
+            painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+        painter.end()
+
+    def zoom_at(self, factor, position):
+        """Zoom by factor while keeping the image point under position fixed."""
+        if not self.levels:
+            return
+        width, height = self.image_size()
+        min_zoom = min(self.width() / width, self.height() / height, 1.0) / 2
+        new_zoom = max(min_zoom, min(self.MAX_ZOOM, self.zoom * factor))
+        anchor = self.origin + QPointF(position.x(), position.y()) / self.zoom
+        self.origin = anchor - QPointF(position.x(), position.y()) / new_zoom
+        self.zoom = new_zoom
+        self.fitted = False
+        self.update()
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        self.zoom_at(1.25 ** steps, event.pos())
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag_start = (event.pos(), QPointF(self.origin))
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_start is not None:
+            start_pos, start_origin = self._drag_start
+            delta = event.pos() - start_pos
+            self.origin = start_origin - QPointF(delta.x(), delta.y()) / self.zoom
+            self.fitted = False
+            self.update()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag_start = None
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_to_view()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.fitted:
+            self.fit_to_view()
+
 
 class ResultWindow(QWidget):
     def __init__(self, image, video_path, parent=None):
         super().__init__(parent)
         self.image = image
         self.video_path = video_path
+        self.png_compression = 3
+        self.save_threads = []
         self.setWindowTitle('Interpolation result')
-
-        # Display the QImage in QLabel
-        self.label = QLabel(self)
-        self.label.setScaledContents(True)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.label.setAlignment(Qt.AlignCenter)
+
+        # Tiled view: only visible tiles of the image pyramid are ever converted
+        self.view = TiledImageView(parent=self)
 
         self.init_ui()
 
 
     def init_ui(self):
-        # get original image dimensions
-        print(f"self.image.dtype: {self.image.dtype}, shape: {self.image.shape}")
-        image_rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
-        image_rgb = np.ascontiguousarray(image_rgb)
-        #image_rgb = self.image.copy()  # currently in BGR mode
-        height, width, channel = image_rgb.shape
-        bytes_per_line = 3 * width
-        q_img = QImage(image_rgb.data, width, height, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(q_img)
+        height, width = self.image.shape[:2]
 
         # Adjust window size
         self.adjust_window_size(width, height)
 
         # set layout
         layout = QVBoxLayout()
-        layout.addWidget(self.label)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.view)
         self.setLayout(layout)
 
         self.center()
 
-        #Update the label:
-        self.label.setPixmap(pixmap)
-        self.label.setScaledContents(True)
+        # Update the view
+        self.view.set_image(self.image)
 
         # Enable context menu
-        self.label.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.label.customContextMenuRequested.connect(self.show_context_menu)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
 
 
     def adjust_window_size(self, image_width, image_height):
@@ -69,34 +223,15 @@ class ResultWindow(QWidget):
             image_height = max_height
             image_width = image_height * aspect_ratio
 
-        # Convert dimensions to integers
-        image_width = int(image_width)
-        image_height = int(image_height)
-
-        #resize image for display purposes
-        resized_image = cv2.resize(self.image, (image_width, image_height), interpolation=cv2.INTER_AREA)
-
-        #convert the resized image to QPixmap
-        image_rgb = cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB)
-        bytes_per_line = 3 * image_width
-        q_img = QImage(resized_image.data, image_width, image_height, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(q_img)
-
-
-        #update QLabel and QPixmap with resized image
-        self.label.setPixmap(pixmap)
-        self.label.adjustSize()
-
-        # resize window to mathc image size
-        self.resize(image_width, image_height)
+        # resize window to match the fitted image size
+        self.resize(int(image_width), int(image_height))
 
 
     def set_image(self, image_path):
-        pixmap = QPixmap(image_path)
-        self.label.setPixmap(pixmap)
-        self.label.setScaledContents(True)
-        self.resize(pixmap.size())
-        self.adjust_window_size(pixmap.width(), pixmap.height())
+        self.image = cv2.imread(image_path)
+        height, width = self.image.shape[:2]
+        self.view.set_image(self.image)
+        self.adjust_window_size(width, height)
 
     def center(self):
         # Centers the window on the screen
@@ -109,7 +244,16 @@ class ResultWindow(QWidget):
         context_menu = QMenu(self)
         save_action = context_menu.addAction("Save As...")
         save_action.triggered.connect(self.save_image_as)
-        context_menu.exec_(self.mapToGlobal(position))
+
+        compression_menu = context_menu.addMenu("PNG Compression")
+        compression_group = QActionGroup(compression_menu)
+        for label, level in PNG_COMPRESSION_LEVELS:
+            action = compression_menu.addAction(f"{label} ({level})")
+            action.setCheckable(True)
+            action.setChecked(level == self.png_compression)
+            action.triggered.connect(lambda checked, level=level: setattr(self, 'png_compression', level))
+            compression_group.addAction(action)
+        context_menu.exec_(self.view.mapToGlobal(position))
 
     def save_image_as(self):
         options = QFileDialog.Options()
@@ -117,8 +261,29 @@ class ResultWindow(QWidget):
         base_name = os.path.basename(self.video_path)
         suggested_name = os.path.splitext(base_name)[0] + "_interp.png"
 
-        save_path, _ = QFileDialog.getSaveFileName(self, "Save image as", suggested_name, "PNG Files (*.png);;All Files (*)", options=options)
+        save_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save image as", suggested_name, ";;".join(SAVE_FORMATS), options=options)
 
         if save_path:
-            image_rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
-            QImage(image_rgb.data, image_rgb.shape[1], image_rgb.shape[0], image_rgb.strides[0], QImage.Format_RGB888).save(save_path)
+            extension = SAVE_FORMATS.get(selected_filter, ".png")
+            if not os.path.splitext(save_path)[1]:
+                save_path += extension
+
+            # Encoding a large composite takes seconds, so it runs off the GUI thread
+            thread = ImageSaveThread(self.image, save_path, self.png_compression)
+            thread.saved.connect(lambda path: self.setWindowTitle(f'Interpolation result - saved {os.path.basename(path)}'))
+            thread.failed.connect(self.on_save_failed)
+            thread.finished.connect(lambda: self.save_threads.remove(thread))
+            self.save_threads.append(thread)
+            self.setWindowTitle('Interpolation result - saving...')
+            thread.start()
+
+    def on_save_failed(self, message):
+        print(message)
+        self.setWindowTitle('Interpolation result - save failed')
+
+    def closeEvent(self, event):
+        # Let pending saves finish so their files are complete
+        for thread in list(self.save_threads):
+            thread.wait()
+        super().closeEvent(event)
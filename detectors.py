@@ -0,0 +1,61 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class CandidateClassifier(ABC):
+    """
+    Interface for second-stage detectors that score candidate boxes.
+
+    VideoProcessor collects crops of the boxes found by detect_fast_objects from
+    many frames and passes them to score() in batches, so per-call overhead is
+    paid once per batch rather than once per crop.
+    """
+
+    crop_size = 32
+
+    @abstractmethod
+    def score(self, crops):
+        """
+        Score a batch of crops.
+
+        crops is a uint8 array of shape (N, crop_size, crop_size, 3) in BGR order.
+        Returns N scores in [0, 1]; higher means the crop shows a target.
+        """
+
+
+class TorchCropClassifier(CandidateClassifier):
+    """
+    Score crops with a TorchScript model on the CPU.
+
+    The model receives a float tensor of shape (N, 3, crop_size, crop_size)
+    scaled to [0, 1] and returns one logit per crop, shape (N,) or (N, 1).
+    torch is only imported when this class is used. threads limits torch's
+    intra-op threads while score() runs; torch's global setting is restored
+    afterwards.
+    """
+
+    def __init__(self, model_path, crop_size=32, threads=None):
+        try:
+            import torch
+        except ImportError as e:
+            raise ImportError("TorchCropClassifier needs torch; install it with 'pip install torch'") from e
+        self.torch = torch
+        self.crop_size = crop_size
+        self.threads = threads
+        self.model = torch.jit.load(model_path, map_location='cpu')
+        self.model.eval()
+
+    def score(self, crops):
+        torch = self.torch
+        previous_threads = torch.get_num_threads()
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        try:
+            with torch.inference_mode():
+                batch = torch.from_numpy(np.ascontiguousarray(crops)).permute(0, 3, 1, 2).float().div_(255)
+                logits = self.model(batch).reshape(len(crops), -1)[:, 0]
+                return torch.sigmoid(logits).numpy()
+        finally:
+            if self.threads:
+                torch.set_num_threads(previous_threads)
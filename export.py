@@ -0,0 +1,86 @@
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+# cv2.IMWRITE_TIFF_COMPRESSION value for LZW
+TIFF_COMPRESSION_LZW = 5
+
+
+class BackgroundVideoWriter(threading.Thread):
+    """
+    Encode frames with cv2.VideoWriter on a background thread.
+
+    Frames are handed over through a bounded queue, so write() blocks once
+    queue_size frames are waiting and memory stays at a few frames no matter
+    how long the video is. Frames must not be modified after they are written.
+    """
+
+    def __init__(self, path, fps, frame_size, fourcc='mp4v', queue_size=4):
+        super().__init__(daemon=True)
+        self.path = path
+        self.fps = fps
+        self.frame_size = frame_size
+        self.fourcc = fourcc
+        self.frames_written = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def run(self):
+        writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.frame_size)
+        try:
+            if not writer.isOpened():
+                raise IOError(f"Could not open video writer for {self.path}")
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+                self.frames_written += 1
+        except Exception as e:
+            self.error = e
+            # Keep draining so a blocked write() can return
+            while self._queue.get() is not None:
+                pass
+        finally:
+            writer.release()
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self._queue.put(frame)
+
+    def close(self):
+        """Flush the remaining frames, wait for the encoder and re-raise any encoding error."""
+        self._queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+
+def save_image(path, image, png_compression=3):
+    """
+    Save a BGR image, picking the format from the file extension.
+
+    PNG uses the given zlib compression level (0 fastest, 9 smallest), WebP is
+    written lossless and TIFF with LZW. PNG and TIFF keep the image's own bit
+    depth, so 16-bit images stay 16-bit; WebP only holds 8 bits per channel.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    params = []
+    if extension == '.webp' and image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    if extension == '.png':
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    elif extension == '.webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101]  # above 100 selects lossless
+    elif extension in ('.tif', '.tiff'):
+        params = [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSION_LZW]
+
+    # imencode + tofile also copes with non-ASCII paths, unlike imwrite on Windows
+    success, buffer = cv2.imencode(extension or '.png', image, params)
+    if not success:
+        raise IOError(f"Could not encode image as {extension}")
+    buffer.tofile(path)
@@ -0,0 +1,108 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+import cv2
+
+
+class FrameScrubber:
+    """
+    Random access to the frames of a video without holding the clip in memory.
+
+    A keyframe index is built the first time a frame has to be decoded, so
+    opening a scrubber stays cheap when it is never used. Jumping to a frame seeks to the keyframe before it and decodes forward, so a jump costs
+    at most one GOP. Every frame decoded on the way is kept in a small LRU
+    cache, so stepping around the cursor rarely touches the decoder. Without
+    ffprobe the scrubber falls back to OpenCV's own frame seeking.
+    """
+
+    def __init__(self, video_path, cache_size=32, verbose=False):
+        self.video_path = video_path
+        self.cache_size = cache_size
+        self.verbose = verbose
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Error opening video file {video_path}")
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+        # Built by the keyframes property on first use; None falls back to frame seeking
+        self._keyframes = None
+        self._keyframes_indexed = False
+        self.cache = OrderedDict()
+        # Index of the frame the next cap.read() returns
+        self.position = 0
+        self.decoded_frames = 0
+        self.seeks = 0
+
+    def __len__(self):
+        return self.frame_count
+
+    @property
+    def keyframes(self):
+        """Sorted keyframe indices, or None without ffprobe. Indexed on first access."""
+        if not self._keyframes_indexed:
+            self.keyframes = self.build_keyframe_index()
+        return self._keyframes
+
+    @keyframes.setter
+    def keyframes(self, keyframes):
+        self._keyframes = keyframes
+        self._keyframes_indexed = True
+
+    def build_keyframe_index(self):
+        """Return the sorted keyframe indices, or None if ffprobe is unavailable."""
+        try:
+            from mov_converter import keyframe_indices
+        except ImportError:
+            return None
+        try:
+            keyframes = keyframe_indices(self.video_path)
+        except Exception as e:
+            if self.verbose:
+                print(f"Could not index keyframes, falling back to frame seeking: {e}")
+            return None
+        if not keyframes or keyframes[0] != 0:
+            return None
+        if self.verbose:
+            print(f"Indexed {len(keyframes)} keyframes")
+        return keyframes
+
+    def get_frame(self, index):
+        """Return frame index (shared with the cache, copy before drawing on it), or None."""
+        if not 0 <= index < self.frame_count:
+            return None
+        frame = self.cache.get(index)
+        if frame is not None:
+            self.cache.move_to_end(index)
+            return frame
+
+        if self.keyframes is not None:
+            keyframe = self.keyframes[bisect_right(self.keyframes, index) - 1]
+            # Decode forward from the current position when it is in the same GOP
+            if not keyframe <= self.position <= index:
+                self.seek(keyframe)
+        elif self.position != index:
+            self.seek(index)
+
+        while self.position <= index:
+            success, frame = self.cap.read()
+            if not success:
+                return None
+            self.decoded_frames += 1
+            self.remember(self.position, frame)
+            self.position += 1
+        return frame
+
+    def seek(self, index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        self.position = index
+        self.seeks += 1
+
+    def remember(self, index, frame):
+        self.cache[index] = frame
+        self.cache.move_to_end(index)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def release(self):
+        self.cache.clear()
+        self.cap.release()
@@ -3,11 +3,13 @@ import sys
 import cv2
 
 from Result import ResultWindow
-from PyQt5.QtWidgets import QSizePolicy, QApplication, QMainWindow, QFileDialog, QLabel, QSlider, QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QProgressBar
+from PyQt5.QtWidgets import QSizePolicy, QApplication, QMainWindow, QFileDialog, QLabel, QSlider, QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QProgressBar, QShortcut, QComboBox
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPixmap, QImage, QPainter, QPen, QColor
+from PyQt5.QtGui import QPixmap, QImage, QPainter, QPen, QColor, QKeySequence
+import session_file
 import video_processing
 from video_thread import VideoProcessingThread
+from frame_scrubber import FrameScrubber
 
 
 class EraserLabel(QLabel):
@@ -28,6 +30,8 @@ class EraserLabel(QLabel):
         ):
             self._erasing = True
             self._cursor_pos = event.pos()
+            if hasattr(self.parent_window, "begin_eraser_stroke"):
+                self.parent_window.begin_eraser_stroke()
             self.parent_window.handle_eraser_click(self._cursor_pos.x(), self._cursor_pos.y())
             self.update()
             event.accept()
@@ -47,6 +51,8 @@ class EraserLabel(QLabel):
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
+            if self._erasing and hasattr(self.parent_window, "end_eraser_stroke"):
+                self.parent_window.end_eraser_stroke()
             self._erasing = False
         self._cursor_pos = event.pos()
         self.update()
@@ -84,6 +90,9 @@ class CustodianApp(QMainWindow):
         self.processor = video_processing.VideoProcessor(None, self.threshold_value, None, None)
         self.frames = []
         self.current_frame_index = 0
+        self.scrubber = None
+        self.frame_label = None
+        self.frame_slider = None
         self.video_path = None
         self.video_preview_label = None
         self.video_preview_scroll_area = None
@@ -91,7 +100,6 @@ class CustodianApp(QMainWindow):
         self.threshold_slider = None
         self.video_label = None
         self.threshold_label = None
-        self.thread = None
         self.info_text_panel = None
         self.progress = None
         self.preprocess_button = None
@@ -102,8 +110,14 @@ class CustodianApp(QMainWindow):
         self.eraser_mode = False
         self.eraser_radius = 10
         self.cancel_button = None
-        self.pending_thread_params = None
+        self.trail_output_path = None
         self.cancel_requested = False
+        # One worker thread is reused for every job
+        self.thread = VideoProcessingThread()
+        self.thread.progress.connect(self.progress_bar_value)
+        self.thread.finished.connect(self.on_processing_finished)
+        self.thread.failed.connect(self.on_processing_failed)
+        self.thread.preview.connect(self.show_preview_frame)
 
         self.initUI()
 
@@ -148,6 +162,20 @@ class CustodianApp(QMainWindow):
         self.process_button.setEnabled(False)  # Disable initially
         button_layout.addWidget(self.process_button)
 
+        # Auto-calibrate button
+        self.calibrate_button = QPushButton('Auto Calibrate', self)
+        self.calibrate_button.clicked.connect(self.auto_calibrate)
+        self.calibrate_button.setFixedHeight(40)
+        button_layout.addWidget(self.calibrate_button)
+
+        # Composite mode used by Generate Image
+        self.composite_combo = QComboBox(self)
+        for label, mode in (('Paste boxes', 'process'), ('Lighten stack', 'lighten'),
+                            ('Darken stack', 'darken'), ('Lighten stack (boxes only)', 'lighten_boxes'),
+                            ('Trail video (MP4)', 'trail')):
+            self.composite_combo.addItem(label, mode)
+        button_layout.addWidget(self.composite_combo)
+
         # Eraser toggle button
         self.eraser_button = QPushButton('Eraser: Off', self)
         self.eraser_button.setCheckable(True)
@@ -156,6 +184,13 @@ class CustodianApp(QMainWindow):
         self.eraser_button.setEnabled(False)
         button_layout.addWidget(self.eraser_button)
 
+        # Slow mover detection toggle button
+        self.slow_button = QPushButton('Slow Movers: Off', self)
+        self.slow_button.setCheckable(True)
+        self.slow_button.clicked.connect(self.toggle_slow_movers)
+        self.slow_button.setFixedHeight(40)
+        button_layout.addWidget(self.slow_button)
+
         # Cancel button
         self.cancel_button = QPushButton('Cancel', self)
         self.cancel_button.clicked.connect(self.cancel_processing)
@@ -163,6 +198,10 @@ class CustodianApp(QMainWindow):
         self.cancel_button.setEnabled(False)
         button_layout.addWidget(self.cancel_button)
 
+        # Undo/redo for eraser strokes
+        QShortcut(QKeySequence.Undo, self, activated=self.undo_erase)
+        QShortcut(QKeySequence.Redo, self, activated=self.redo_erase)
+
         button_layout.addStretch(1)
         button_and_preview_layout.addLayout(button_layout)
         main_layout.addLayout(button_and_preview_layout)
@@ -170,6 +209,16 @@ class CustodianApp(QMainWindow):
         sliders_container = QWidget()
         sliders_layout = QVBoxLayout(sliders_container)
 
+        # Frame slider for stepping through the clip with each frame's boxes drawn
+        self.frame_label = QLabel('Frame: 0', self)
+        sliders_layout.addWidget(self.frame_label)
+        self.frame_slider = QSlider(Qt.Horizontal, self)
+        self.frame_slider.setMinimum(0)
+        self.frame_slider.setMaximum(0)
+        self.frame_slider.setEnabled(False)
+        self.frame_slider.valueChanged.connect(self.scrub_to_frame)
+        sliders_layout.addWidget(self.frame_slider)
+
         # Add threshold label
         self.threshold_label = QLabel(f'Threshold: {self.threshold_value}', self)
         #self.threshold_label.setFixedHeight(20)
@@ -272,14 +321,19 @@ class CustodianApp(QMainWindow):
             self.threshold_slider.blockSignals(False)
             self.threshold_label.setText(f'Threshold: {self.threshold_value}')
             self.processor = video_processing.VideoProcessor(self.video_path, self.threshold_value, self.video_preview_label)
+            self.processor.detect_slow = self.slow_button.isChecked()
+            self.processor.progressive = True  # show rough results quickly, then fill in
+            self.processor.composite_workers = os.cpu_count() or 1
             self.processor.load_video()
             self.frames = self.processor.frames
             if self.frames:
                 self.current_frame_index = 0
+                self.open_scrubber()
                 self.display_frame(0)
                 self.append_text("Video loaded successfully.")
                 self.preprocess_button.setEnabled(True)  # Enable preprocess button
-                self.preprocess_video()
+                if not self.load_saved_session():
+                    self.preprocess_video()
             else:
                 self.append_text("Failed to load frames. Please select a different video.")
                 self.video_path = None
@@ -293,13 +347,50 @@ class CustodianApp(QMainWindow):
             self.frames = self.processor.frames
             self.preprocess_video()
 
+    def load_saved_session(self):
+        """Restore detections from the video's session file, if it has a valid one."""
+        if not session_file.load_session(self.processor):
+            return False
+
+        self.threshold_value = self.processor.threshold_value
+        for slider, value in ((self.threshold_slider, self.processor.threshold_value),
+                              (self.min_speed_slider, self.processor.min_speed),
+                              (self.max_size_slider, self.processor.max_size)):
+            slider.blockSignals(True)
+            slider.setValue(value)
+            slider.blockSignals(False)
+        self.threshold_label.setText(f'Threshold: {self.processor.threshold_value}')
+        self.min_speed_label.setText(f'Min Speed: {self.processor.min_speed}')
+        self.max_size_label.setText(f'Max Size: {self.processor.max_size}')
+        self.slow_button.setChecked(self.processor.detect_slow)
+        self.slow_button.setText(f"Slow Movers: {'On' if self.processor.detect_slow else 'Off'}")
+
+        self.frames = self.processor.preprocessed_frames
+        self.display_frame(0)
+        self.process_button.setEnabled(True)
+        self.eraser_button.setEnabled(True)
+        self.append_text("Loaded saved detections, skipping preprocessing.")
+        return True
+
+    def save_session(self):
+        if self.processor and self.video_path and self.processor.preprocess_complete:
+            try:
+                session_file.save_session(self.processor)
+            except OSError as e:
+                self.append_text(f"Could not save session: {e}")
+
+    def closeEvent(self, event):
+        self.thread.stop()
+        if self.scrubber is not None:
+            self.scrubber.release()
+        self.save_session()
+        super().closeEvent(event)
+
     def display_frame(self, frame_index, rgb_frame=None):
         if rgb_frame is None:
             if 0 <= frame_index < len(self.frames):
                 rgb_frame = cv2.cvtColor(self.frames[frame_index], cv2.COLOR_BGR2RGB)
         if rgb_frame is not None:
-            if 0 <= frame_index < len(self.frames):
-                rgb_frame = cv2.cvtColor(self.frames[frame_index], cv2.COLOR_BGR2RGB)
             height, width, channel = rgb_frame.shape
             bytes_per_line = channel * width
             q_image = QImage(rgb_frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
@@ -313,11 +404,48 @@ class CustodianApp(QMainWindow):
             self.video_preview_label.setPixmap(scaled_pixmap)
             self.video_preview_label.update()
 
+    def open_scrubber(self):
+        """Open the loaded video for the frame slider; its keyframes are indexed on the first scrub."""
+        if self.scrubber is not None:
+            self.scrubber.release()
+            self.scrubber = None
+        try:
+            self.scrubber = FrameScrubber(self.video_path)
+        except IOError as e:
+            self.append_text(f"Frame slider unavailable: {e}")
+        count = len(self.scrubber) if self.scrubber is not None else 0
+        self.frame_slider.blockSignals(True)
+        self.frame_slider.setMaximum(max(0, count - 1))
+        self.frame_slider.setValue(0)
+        self.frame_slider.blockSignals(False)
+        self.frame_slider.setEnabled(count > 1)
+        self.frame_label.setText('Frame: 0')
+
+    def scrub_to_frame(self, value):
+        """Show frame value with its own boxes; frame 0 shows the combined preview."""
+        self.frame_label.setText(f'Frame: {value}')
+        if value == 0 or self.scrubber is None:
+            self.display_frame(self.current_frame_index)
+            return
+        # Frames already in memory are served directly; the scrubber decodes the rest
+        if self.processor and value < len(self.processor.frames):
+            frame = self.processor.frames[value]
+        else:
+            frame = self.scrubber.get_frame(value)
+        if frame is None:
+            return
+        frame = frame.copy()
+        if self.processor:
+            if value < len(self.processor.all_positions):
+                self.processor.draw_boxes(frame, self.processor.all_positions[value])
+            if value < len(self.processor.slow_positions):
+                self.processor.draw_boxes(frame, self.processor.slow_positions[value], (0, 0, 255))
+        self.display_frame(value, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
     def update_threshold(self, value):
         self.threshold_value = value
         self.threshold_label.setText(f'Threshold: {value}')
         self.processor.threshold_value = value
-        self.processor.create_background_subtractor()
         self.display_frame(self.current_frame_index)
         self.slider_timer.start(300)
 
@@ -344,8 +472,17 @@ class CustodianApp(QMainWindow):
         self.eraser_mode = self.eraser_button.isChecked()
         state = "On" if self.eraser_mode else "Off"
         self.eraser_button.setText(f"Eraser: {state}")
+        if not self.eraser_mode:
+            self.save_session()
         self.video_preview_label.update()
 
+    def toggle_slow_movers(self):
+        detect_slow = self.slow_button.isChecked()
+        self.slow_button.setText(f"Slow Movers: {'On' if detect_slow else 'Off'}")
+        if self.processor:
+            self.processor.detect_slow = detect_slow
+            self.slider_timer.start(300)
+
     def label_to_frame_coordinates(self, x, y):
         if not self.processor or not self.processor.frames:
             return 0, 0
@@ -374,6 +511,24 @@ class CustodianApp(QMainWindow):
         fx, fy = self.label_to_frame_coordinates(x, y)
         if self.processor:
             self.processor.remove_boxes_at(fx, fy, self.eraser_radius)
+            if self.frame_slider.value():
+                self.scrub_to_frame(self.frame_slider.value())
+
+    def begin_eraser_stroke(self):
+        if self.processor:
+            self.processor.begin_erase_stroke()
+
+    def end_eraser_stroke(self):
+        if self.processor:
+            self.processor.end_erase_stroke()
+
+    def undo_erase(self):
+        if self.processor and self.eraser_button.isEnabled() and not self.processor.undo_erase():
+            self.append_text("Nothing to undo.")
+
+    def redo_erase(self):
+        if self.processor and self.eraser_button.isEnabled() and not self.processor.redo_erase():
+            self.append_text("Nothing to redo.")
 
     def process_slider_change(self):
         print("slider changed - preprocess_video called")
@@ -393,63 +548,114 @@ class CustodianApp(QMainWindow):
             self.append_text("Please preprocess the video first.")
             return
 
+        mode = self.composite_combo.currentData()
+        output_path = None
+        if mode == 'trail':
+            suggested_name = os.path.splitext(os.path.basename(self.video_path))[0] + "_trail.mp4"
+            output_path, _ = QFileDialog.getSaveFileName(self, "Export trail video", suggested_name, "MP4 Files (*.mp4)")
+            if not output_path:
+                return
+
         self.append_text("Processing video...")
         self.preprocess_button.setEnabled(False)  # Disable preprocess button
         self.process_button.setEnabled(False)  # Disable process button
         self.eraser_button.setChecked(False)
         self.toggle_eraser()
-        self.start_processing_thread(mode='process')
+        self.start_processing_thread(mode=mode, output_path=output_path)
 
 
-    def start_processing_thread(self, mode='process', green_boxes=None, red_boxes=None):
-        if self.thread is not None and self.thread.isRunning():
-            print("Previous process still running... cancelling")
-            self.pending_thread_params = (mode, green_boxes, red_boxes)
-            self.cancel_processing()
+    def auto_calibrate(self):
+        if not self.processor or not self.processor.frames:
+            self.append_text("Please upload a video first.")
             return
+        self.append_text("Sampling frames to calibrate parameters...")
+        self.calibrate_button.setEnabled(False)
+        self.start_processing_thread(mode='calibrate')
+
+    def start_processing_thread(self, mode='process', green_boxes=None, red_boxes=None, output_path=None):
+        if self.thread.busy:
+            print("Previous process still running... replacing it")
 
-        print(f"Starting {mode} thread...")
+        print(f"Starting {mode} job...")
         self.progress_bar.setValue(0)
-        self.thread = VideoProcessingThread(
-            self.processor, mode, green_boxes, red_boxes)
+        if mode == 'trail':
+            self.trail_output_path = output_path
         self.processor.progress_signal = self.thread.progress
-        self.thread.progress.connect(self.progress_bar.setValue)
-        self.thread.finished.connect(self.on_processing_finished)
-        self.thread.finished.connect(lambda: self.cancel_button.setEnabled(False))
+        self.processor.preview_signal = self.thread.preview
         self.cancel_button.setEnabled(True)
-        self.thread.start()
+        # The worker keeps only the latest request and reuses cached detection work
+        self.thread.submit(self.processor, mode, green_boxes, red_boxes, output_path)
+
+    def show_preview_frame(self, frame):
+        """Draw a preview frame emitted by the worker thread, unless another frame is being inspected."""
+        if self.frame_slider.value() == 0:
+            self.display_frame(0, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def progress_bar_value(self, value):
+        if self.progress_bar is not None:
+            self.progress_bar.setValue(value)
 
     def cancel_processing(self):
-        if self.thread and self.thread.isRunning():
+        if self.thread.busy:
 
             self.cancel_requested = True
-            self.thread.requestInterruption()
+            self.thread.cancel()
             self.cancel_button.setEnabled(False)
 
 
-    def on_processing_finished(self, result_images):
-        if self.cancel_requested:
+    def on_processing_failed(self, mode, message):
+        self.cancel_button.setEnabled(False)
+        self.cancel_requested = False
+        self.progress_bar.setValue(0)
+        self.append_text(f"{mode.capitalize()} failed: {message}")
+        self.calibrate_button.setEnabled(True)
+        self.preprocess_button.setEnabled(True)
+        self.process_button.setEnabled(self.processor is not None and self.processor.preprocess_complete)
+        self.eraser_button.setEnabled(self.processor is not None and self.processor.preprocess_complete)
+
+    def on_processing_finished(self, mode, result_images):
+        self.cancel_button.setEnabled(False)
+        self.calibrate_button.setEnabled(True)
+        cancelled = self.cancel_requested
+        if cancelled:
             self.progress_bar.setValue(0)
             self.cancel_requested = False
-            if self.pending_thread_params:
-                mode, green, red = self.pending_thread_params
-                self.pending_thread_params = None
-                self.start_processing_thread(mode, green, red)
+
+        if mode == 'calibrate':
+            if result_images is None:
                 return
+            self.append_text(
+                f"Suggested threshold {result_images['threshold']}, min speed {result_images['min_speed']}, "
+                f"max size {result_images['max_size']} ({result_images['boxes_per_pair']:.2f} boxes per pair)")
+            # Moving the sliders reruns preprocessing with the new values
+            self.threshold_slider.setValue(result_images['threshold'])
+            self.min_speed_slider.setValue(result_images['min_speed'])
+            self.max_size_slider.setValue(result_images['max_size'])
+            return
 
-        if self.thread.mode == 'preprocess':
+        if mode == 'preprocess':
             print("Preprocessing finished successfully.")
             self.frames = result_images
             self.display_frame(self.current_frame_index)
+            if self.frame_slider.value():
+                self.scrub_to_frame(self.frame_slider.value())
 
             self.append_text("Preprocessing complete. You can now adjust the threshold if needed.")
+            if self.processor.skipped_frames:
+                self.append_text(f"Skipped {self.processor.skipped_frames} idle frame pairs.")
             self.append_text("Click 'Process' when ready to generate the final image.")
             self.process_button.setEnabled(True)
             print(f"Process button enabled: {self.process_button.isEnabled()}")
             self.preprocess_button.setEnabled(True)  # Re-enable preprocess button
             self.eraser_button.setEnabled(True)
+            self.save_session()
         else:
             print("Processing final image.")
+            if mode == 'trail':
+                if cancelled:
+                    self.append_text(f"Trail video cancelled; {self.trail_output_path} is incomplete")
+                else:
+                    self.append_text(f"Trail video saved to {self.trail_output_path}")
             if hasattr(self, 'result_window') and self.result_window is not None:
                 self.result_window.close()
             result_image = result_images[0]
@@ -474,6 +680,8 @@ class CustodianApp(QMainWindow):
         self.eraser_button.setChecked(False)
         self.toggle_eraser()
         self.eraser_button.setEnabled(False)
+        # A calibration job would supersede this run and leave a partial preview
+        self.calibrate_button.setEnabled(False)
         self.start_processing_thread(mode='preprocess')
 
 if __name__ == '__main__':
@@ -1,6 +1,137 @@
+"""
+Ingest videos the app cannot open directly.
+
+If the codec is already readable by cv2.VideoCapture the streams are just
+remuxed into the new container. Otherwise the input is split on keyframes
+with stream copy, the segments are transcoded by parallel ffmpeg processes,
+and the results are joined with the concat demuxer without re-encoding.
+"""
+import argparse
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
 import ffmpeg
 
-input_file = '6-6-24 john blackhawk real time.mov'
-output_file = '6-6-24 john blackhawk real time.mp4'
 
-ffmpeg.input(input_file).output(output_file, vcodec='libx264', acodec='aac').run()
+def probe_video(path):
+    """Return ffprobe's format and stream information for path."""
+    return ffmpeg.probe(path)
+
+
+def keyframe_indices(path):
+    """Return the presentation-order frame indices of the video's keyframes."""
+    info = ffmpeg.probe(path, select_streams='v:0', show_entries='packet=pts,flags', show_packets=None)
+    packets = [p for p in info.get('packets', []) if p.get('pts') not in (None, 'N/A')]
+    # Packets come in decode order; sort by pts so indices match decoded frames
+    packets.sort(key=lambda p: int(p['pts']))
+    return [i for i, p in enumerate(packets) if 'K' in p.get('flags', '')]
+
+
+def cv2_can_read(path):
+    """True if cv2.VideoCapture opens path and decodes its first frame."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return False
+        ret, _ = cap.read()
+        return ret
+    finally:
+        cap.release()
+
+
+def remux(input_file, output_file):
+    """Copy the video and audio streams into output_file's container without re-encoding."""
+    (ffmpeg.input(input_file)
+        .output(output_file, c='copy')
+        .run(overwrite_output=True, quiet=True))
+
+
+def split_on_keyframes(input_file, segment_dir, segment_seconds=10):
+    """
+    Stream-copy input_file into segments of roughly segment_seconds. With stream
+    copy, ffmpeg can only cut at keyframes, so each segment decodes on its own.
+    """
+    extension = os.path.splitext(input_file)[1] or '.mov'
+    pattern = os.path.join(segment_dir, f'segment_%05d{extension}')
+    (ffmpeg.input(input_file)
+        .output(pattern, c='copy', f='segment', segment_time=segment_seconds, reset_timestamps=1)
+        .run(overwrite_output=True, quiet=True))
+    return sorted(os.path.join(segment_dir, name) for name in os.listdir(segment_dir)
+                  if name.startswith('segment_'))
+
+
+def transcode_segment(input_file, output_file, vcodec='libx264', acodec='aac', threads=0):
+    (ffmpeg.input(input_file)
+        .output(output_file, vcodec=vcodec, acodec=acodec, threads=threads)
+        .run(overwrite_output=True, quiet=True))
+    return output_file
+
+
+def concat_segments(segments, output_file):
+    """Join segments that share codec parameters with the concat demuxer."""
+    list_path = output_file + '.segments.txt'
+    with open(list_path, 'w') as f:
+        for segment in segments:
+            escaped = os.path.abspath(segment).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        (ffmpeg.input(list_path, f='concat', safe=0)
+            .output(output_file, c='copy')
+            .run(overwrite_output=True, quiet=True))
+    finally:
+        os.remove(list_path)
+
+
+def convert(input_file, output_file, workers=None, segment_seconds=10, vcodec='libx264', acodec='aac',
+            allow_remux=True):
+    """
+    Make output_file readable by cv2.VideoCapture as quickly as possible.
+    Returns 'remux' if the streams were copied, 'transcode' otherwise.
+    """
+    if allow_remux and cv2_can_read(input_file):
+        try:
+            remux(input_file, output_file)
+            if cv2_can_read(output_file):
+                return 'remux'
+        except ffmpeg.Error as e:
+            print(f"Remux failed, transcoding instead: {e.stderr.decode(errors='replace') if e.stderr else e}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+    workers = workers or os.cpu_count() or 1
+    # Split the cores between the encoder processes instead of oversubscribing
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        split_dir = os.path.join(tmp, 'split')
+        os.mkdir(split_dir)
+        segments = split_on_keyframes(input_file, split_dir, segment_seconds)
+        outputs = [os.path.join(tmp, f'encoded_{i:05d}.mp4') for i in range(len(segments))]
+        # Each job blocks on its own ffmpeg process, so threads are enough here
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda job: transcode_segment(*job, vcodec=vcodec, acodec=acodec, threads=threads),
+                          zip(segments, outputs)))
+        concat_segments(outputs, output_file)
+    return 'transcode'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a video into a format the app can open.')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file', nargs='?', help='defaults to the input name with an .mp4 extension')
+    parser.add_argument('--workers', type=int, default=None, help='parallel encoder processes')
+    parser.add_argument('--segment-seconds', type=float, default=10)
+    parser.add_argument('--vcodec', default='libx264')
+    parser.add_argument('--acodec', default='aac')
+    parser.add_argument('--no-remux', action='store_true', help='always transcode')
+    args = parser.parse_args(argv)
+
+    output_file = args.output_file or os.path.splitext(args.input_file)[0] + '.mp4'
+    method = convert(args.input_file, output_file, args.workers, args.segment_seconds,
+                     args.vcodec, args.acodec, allow_remux=not args.no_remux)
+    print(f"Wrote {output_file} ({method})")
+
+
+if __name__ == '__main__':
+    main()
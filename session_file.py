@@ -0,0 +1,146 @@
+import hashlib
+import os
+import struct
+import zlib
+
+import numpy as np
+
+SIDECAR_SUFFIX = '.custodian'
+MAGIC = b'CSTD'
+VERSION = 2
+
+# magic, version, frame count, fingerprint, then the detector parameters below
+HEADER = struct.Struct('<4sHI16s7i')
+PARAMETERS = ('threshold_value', 'min_speed', 'max_size', 'proxy_scale',
+              'frame_stride', 'adaptive_stride', 'detect_slow')
+FINGERPRINT_CHUNK = 1 << 20
+
+
+def sidecar_path(video_path):
+    """Return the session file stored next to the video."""
+    return video_path + SIDECAR_SUFFIX
+
+
+def video_fingerprint(video_path):
+    """Hash the file size and its first and last MiB, which is enough to tell videos apart."""
+    size = os.path.getsize(video_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if size > FINGERPRINT_CHUNK:
+            f.seek(max(FINGERPRINT_CHUNK, size - FINGERPRINT_CHUNK))
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.digest()
+
+
+def _pack_positions(positions):
+    """Flatten a list of per-frame box lists into count and box arrays."""
+    counts = np.array([len(boxes) for boxes in positions], dtype='<u4')
+    boxes = np.array([box for frame_boxes in positions for box in frame_boxes], dtype='<i4').reshape(-1, 4)
+    return counts.tobytes() + boxes.tobytes()
+
+
+def _unpack_positions(buffer, offset, entries):
+    counts = np.frombuffer(buffer, dtype='<u4', count=entries, offset=offset)
+    offset += counts.nbytes
+    total = int(counts.sum())
+    boxes = np.frombuffer(buffer, dtype='<i4', count=total * 4, offset=offset).reshape(-1, 4)
+    offset += boxes.nbytes
+    positions = []
+    start = 0
+    for count in counts:
+        positions.append([tuple(int(v) for v in box) for box in boxes[start:start + count]])
+        start += count
+    return positions, offset
+
+
+def save_session(processor, path=None):
+    """
+    Write the processor's boxes, eraser history and detector parameters to a
+    binary sidecar next to the video.
+    """
+    path = path or sidecar_path(processor.video_path)
+    header = HEADER.pack(MAGIC, VERSION, len(processor.frames), video_fingerprint(processor.video_path),
+                         *(int(getattr(processor, name)) for name in PARAMETERS))
+    # One row per removed box: stroke number, frame index, slot, then the box
+    erased = np.array([(stroke_id, index, slot) + tuple(box)
+                       for stroke_id, stroke in enumerate(processor.erase_strokes)
+                       for index, slot, box in stroke], dtype='<i4').reshape(-1, 7)
+    body = (struct.pack('<III', len(processor.all_positions), len(processor.slow_positions), len(erased))
+            + _pack_positions(processor.all_positions)
+            + _pack_positions(processor.slow_positions)
+            + erased.tobytes())
+
+    # Write then rename so a crash never leaves a truncated session behind
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(zlib.compress(body))
+    os.replace(temp_path, path)
+    return path
+
+
+def read_session(path):
+    """Parse a sidecar into a dict, or return None if it is missing or unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, frame_count, fingerprint, *values = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return None
+        body = zlib.decompress(data[HEADER.size:])
+
+        fast_entries, slow_entries, erased_count = struct.unpack_from('<III', body)
+        all_positions, offset = _unpack_positions(body, 12, fast_entries)
+        slow_positions, offset = _unpack_positions(body, offset, slow_entries)
+        erased = np.frombuffer(body, dtype='<i4', count=erased_count * 7, offset=offset).reshape(-1, 7)
+        erase_strokes = []
+        for row in erased:
+            if int(row[0]) == len(erase_strokes):
+                erase_strokes.append([])
+            erase_strokes[-1].append((int(row[1]), int(row[2]), tuple(int(v) for v in row[3:])))
+    # Counts that disagree with the body make frombuffer raise ValueError
+    except (OSError, struct.error, zlib.error, ValueError, IndexError):
+        return None
+    return {
+        'frame_count': frame_count,
+        'fingerprint': fingerprint,
+        'parameters': dict(zip(PARAMETERS, values)),
+        'all_positions': all_positions,
+        'slow_positions': slow_positions,
+        'erase_strokes': erase_strokes,
+    }
+
+
+def load_session(processor, path=None, restore_parameters=True):
+    """
+    Restore a saved session into a processor whose video is already loaded.
+
+    The session is only used when the video fingerprint and frame count match.
+    With restore_parameters the saved detector parameters are applied to the
+    processor; otherwise they must equal the processor's current ones. Returns
+    True if the session was applied, in which case preprocessing can be skipped.
+    """
+    path = path or sidecar_path(processor.video_path)
+    if not os.path.exists(path):
+        return False
+    session = read_session(path)
+    if session is None or session['frame_count'] != len(processor.frames):
+        return False
+    if session['fingerprint'] != video_fingerprint(processor.video_path):
+        return False
+
+    parameters = session['parameters']
+    if not restore_parameters and any(int(getattr(processor, name)) != value for name, value in parameters.items()):
+        return False
+    for name, value in parameters.items():
+        current = getattr(processor, name)
+        setattr(processor, name, type(current)(value))
+
+    processor.all_positions = session['all_positions']
+    processor.slow_positions = session['slow_positions']
+    processor.erase_strokes = session['erase_strokes']
+    processor.redo_strokes = []
+    processor.preprocess_complete = True
+    processor.preprocessed_frames = [processor.render_preprocessed_preview()]
+    return True
@@ -0,0 +1,44 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Ensure the project root is on the Python path so export can be imported
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from export import save_image
+
+
+def make_image():
+    image = np.zeros((16, 24, 3), dtype=np.uint8)
+    cv2.rectangle(image, (4, 4), (12, 10), (10, 200, 90), -1)
+    return image
+
+
+def test_save_image_png_compression_levels_are_lossless(tmp_path):
+    image = make_image()
+    for level in (1, 9):
+        path = tmp_path / f"out{level}.png"
+        save_image(str(path), image, png_compression=level)
+        assert np.array_equal(cv2.imread(str(path)), image)
+
+
+def test_save_image_webp_is_lossless(tmp_path):
+    image = make_image()
+    path = tmp_path / "out.webp"
+    save_image(str(path), image)
+    assert np.array_equal(cv2.imread(str(path)), image)
+
+
+def test_save_image_keeps_bit_depth(tmp_path):
+    image = make_image()
+    wide = image.astype(np.uint16) * 257 + 3
+    for name in ("out.png", "out.tiff"):
+        path = tmp_path / name
+        save_image(str(path), image)
+        assert cv2.imread(str(path), cv2.IMREAD_UNCHANGED).dtype == np.uint8
+        save_image(str(path), wide)
+        assert np.array_equal(cv2.imread(str(path), cv2.IMREAD_UNCHANGED), wide)
+
+    path = tmp_path / "out.webp"
+    save_image(str(path), wide)
+    assert np.array_equal(cv2.imread(str(path)), image)
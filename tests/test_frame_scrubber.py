@@ -0,0 +1,71 @@
+import os
+import sys
+import cv2
+import numpy as np
+
+# Ensure the project root is on the Python path so frame_scrubber can be imported
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from frame_scrubber import FrameScrubber
+
+
+def write_numbered_video(path, count=40):
+    """Frame i is filled with grey level 5 * i so it can be identified after decoding."""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (16, 16))
+    for i in range(count):
+        writer.write(np.full((16, 16, 3), 5 * i, dtype=np.uint8))
+    writer.release()
+
+
+def frame_number(frame):
+    return int(round(frame.mean() / 5))
+
+
+def test_random_access_returns_requested_frames(tmp_path):
+    video_file = tmp_path / "numbered.avi"
+    write_numbered_video(video_file)
+    scrubber = FrameScrubber(str(video_file), cache_size=8, verbose=False)
+    assert len(scrubber) == 40
+    for index in (30, 3, 39, 0, 17, 18):
+        assert frame_number(scrubber.get_frame(index)) == index
+    assert scrubber.get_frame(40) is None
+    scrubber.release()
+
+
+def test_keyframe_index_decodes_one_gop_and_caches_it(tmp_path):
+    video_file = tmp_path / "numbered.avi"
+    write_numbered_video(video_file)
+    scrubber = FrameScrubber(str(video_file), cache_size=16, verbose=False)
+    scrubber.keyframes = [0, 10, 20, 30]
+
+    assert frame_number(scrubber.get_frame(25)) == 25
+    assert scrubber.decoded_frames == 6
+
+    # Frames decoded on the way to 25 are served from the cache
+    assert frame_number(scrubber.get_frame(22)) == 22
+    assert scrubber.decoded_frames == 6
+
+    # Stepping forward continues decoding without another seek
+    seeks = scrubber.seeks
+    assert frame_number(scrubber.get_frame(27)) == 27
+    assert scrubber.seeks == seeks
+    assert scrubber.decoded_frames == 8
+    scrubber.release()
+
+
+def test_keyframe_index_is_built_on_first_decode(tmp_path):
+    video_file = tmp_path / "numbered.avi"
+    write_numbered_video(video_file)
+    builds = []
+
+    class CountingScrubber(FrameScrubber):
+        def build_keyframe_index(self):
+            builds.append(self.video_path)
+            return [0, 20]
+
+    scrubber = CountingScrubber(str(video_file), verbose=False)
+    # Opening the scrubber must not probe the whole file
+    assert builds == []
+    assert frame_number(scrubber.get_frame(25)) == 25
+    assert frame_number(scrubber.get_frame(5)) == 5
+    assert len(builds) == 1
+    scrubber.release()
@@ -0,0 +1,57 @@
+import os
+import shutil
+import sys
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("ffmpeg")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg is not installed", allow_module_level=True)
+
+# Ensure the project root is on the Python path so mov_converter can be imported
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import mov_converter
+
+
+def write_video(path, count=30, fps=10):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (32, 24))
+    for i in range(count):
+        frame = np.zeros((24, 32, 3), dtype=np.uint8)
+        cv2.rectangle(frame, (i % 28, 4), (i % 28 + 3, 7), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def count_frames(path):
+    cap = cv2.VideoCapture(str(path))
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    return count
+
+
+def test_convert_remuxes_readable_video(tmp_path):
+    source = tmp_path / "clip.avi"
+    write_video(source)
+    output = tmp_path / "clip.mkv"
+    assert mov_converter.convert(str(source), str(output)) == 'remux'
+    assert count_frames(output) == 30
+
+
+def test_convert_transcodes_segments_in_parallel(tmp_path):
+    source = tmp_path / "clip.avi"
+    write_video(source)
+    output = tmp_path / "clip.mp4"
+    method = mov_converter.convert(str(source), str(output), workers=2, segment_seconds=1, allow_remux=False)
+    assert method == 'transcode'
+    assert count_frames(output) == 30
+
+
+@pytest.mark.skipif(shutil.which("ffprobe") is None, reason="ffprobe is not installed")
+def test_keyframe_indices_starts_at_first_frame(tmp_path):
+    source = tmp_path / "clip.avi"
+    write_video(source)
+    # MJPG frames are all intra coded
+    assert mov_converter.keyframe_indices(str(source)) == list(range(30))
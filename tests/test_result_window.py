@@ -0,0 +1,50 @@
+import os
+import sys
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QPoint, QPointF
+
+# Ensure the project root is on the Python path so Result can be imported
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from Result import TiledImageView
+
+
+def make_view(width=2000, height=1200):
+    app = QApplication.instance() or QApplication([])
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, width // 2:] = (0, 0, 255)
+    view = TiledImageView()
+    view.resize(400, 300)
+    view.set_image(image)
+    return app, view
+
+
+def test_pyramid_halves_until_one_tile():
+    _, view = make_view()
+    sizes = [level.shape[:2] for level in view.levels]
+    assert sizes[0] == (1200, 2000)
+    assert sizes[1] == (600, 1000)
+    assert max(sizes[-1]) <= TiledImageView.TILE_SIZE
+
+
+def test_fitted_view_uses_coarse_level_and_few_tiles():
+    _, view = make_view()
+    # Fitting 2000px into 400px is a zoom of 0.2, served by the quarter-size level
+    assert view.level_for_zoom(view.zoom) == 2
+    assert len(view.visible_tiles()) <= 4
+    image = view.grab().toImage()
+    # Right half of the composite is red
+    colour = image.pixelColor(300, 150)
+    assert colour.red() > 200 and colour.blue() < 50
+
+
+def test_zoom_keeps_point_under_cursor():
+    _, view = make_view()
+    cursor = QPoint(100, 80)
+    before = view.origin + QPointF(cursor) / view.zoom
+    view.zoom_at(4.0, cursor)
+    after = view.origin + QPointF(cursor) / view.zoom
+    assert abs(before.x() - after.x()) < 1e-6 and abs(before.y() - after.y()) < 1e-6
+    assert view.level_for_zoom(view.zoom) < len(view.levels) - 1
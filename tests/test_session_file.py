@@ -0,0 +1,68 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Ensure the project root is on the Python path so the modules can be imported
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from video_processing import VideoProcessor
+import session_file
+
+
+def make_processor(video_file):
+    video_file.write_bytes(os.urandom(4096))
+    proc = VideoProcessor(str(video_file), threshold_value=42, preview_label=None)
+    proc.frames = [np.zeros((20, 20, 3), dtype=np.uint8) for _ in range(4)]
+    proc.min_speed = 12
+    proc.max_size = 300
+    proc.all_positions = [[(1, 2, 3, 4), (5, 6, 7, 8)], [], [(9, 9, 2, 2)]]
+    proc.erase_strokes = [[(1, 0, (0, 0, 4, 4))], [(0, 1, (6, 6, 2, 2)), (2, 0, (7, 7, 2, 2))]]
+    proc.preprocess_complete = True
+    return proc
+
+
+def test_save_and_load_session_round_trip(tmp_path):
+    proc = make_processor(tmp_path / "clip.mp4")
+    path = session_file.save_session(proc)
+    assert path == str(tmp_path / "clip.mp4") + session_file.SIDECAR_SUFFIX
+
+    restored = VideoProcessor(proc.video_path, threshold_value=110, preview_label=None)
+    restored.frames = proc.frames
+    assert session_file.load_session(restored)
+    assert restored.threshold_value == 42
+    assert restored.min_speed == 12 and restored.max_size == 300
+    assert restored.all_positions == proc.all_positions
+    assert restored.erase_strokes == proc.erase_strokes
+    assert restored.preprocessed_frames
+
+
+def test_load_session_rejects_changed_video_or_parameters(tmp_path):
+    proc = make_processor(tmp_path / "clip.mp4")
+    session_file.save_session(proc)
+
+    other = VideoProcessor(proc.video_path, threshold_value=110, preview_label=None)
+    other.frames = proc.frames
+    assert not session_file.load_session(other, restore_parameters=False)
+
+    with open(proc.video_path, 'ab') as f:
+        f.write(b'changed')
+    assert not session_file.load_session(other)
+
+
+def test_inconsistent_sidecar_is_treated_as_absent(tmp_path):
+    import struct
+    import zlib
+
+    proc = make_processor(tmp_path / "clip.mp4")
+    path = session_file.save_session(proc)
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = data[:session_file.HEADER.size]
+    body = zlib.decompress(data[session_file.HEADER.size:])
+    # Claim far more erased rows than the body holds
+    body = struct.pack('<III', len(proc.all_positions), 0, 1000) + body[12:]
+    with open(path, 'wb') as f:
+        f.write(header + zlib.compress(body))
+
+    assert session_file.read_session(path) is None
+    assert not session_file.load_session(proc)
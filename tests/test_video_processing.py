@@ -173,3 +173,618 @@ def test_process_with_squares_can_cancel():
     result = proc.process_with_squares(should_cancel=lambda: True)[0]
     assert np.array_equal(result, frame1)
 
+
+
+def test_preprocess_all_frames_skips_idle_pairs():
+    frame1 = make_frame_with_rect((2, 2), (5, 5), size=(20, 20))
+    frame2 = make_frame_with_rect((8, 2), (11, 5), size=(20, 20))
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frames = [frame1, frame1.copy(), frame2]
+    proc.preprocess_all_frames()
+    assert proc.skipped_frames == 1
+    assert len(proc.all_positions) == 2
+    assert proc.all_positions[0] == []
+
+
+def test_idle_prefilter_keeps_detections():
+    frames = [make_frame_with_rect((2 + 6 * i, 2), (5 + 6 * i, 5), size=(40, 20)) for i in range(4)]
+    results = []
+    for prefilter in (False, True):
+        proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+        proc.min_speed = 1
+        proc.max_size = 200
+        proc.idle_prefilter = prefilter
+        proc.frames = frames
+        proc.preprocess_all_frames()
+        results.append(proc.all_positions)
+    assert results[0] == results[1]
+    assert any(results[1])
+
+
+def test_idle_prefilter_is_skipped_for_tiled_and_proxy_runs():
+    frame = make_frame_with_rect((2, 2), (5, 5), size=(64, 64))
+    for setting, value in (('tile_size', 16), ('proxy_scale', 2)):
+        proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+        proc.tile_overlap = 4
+        proc.min_speed = 1
+        proc.max_size = 200
+        setattr(proc, setting, value)
+        windows = []
+        window_diff = proc.window_diff
+
+        def recording_diff(frame, prev_frame, window):
+            windows.append(window)
+            return window_diff(frame, prev_frame, window)
+
+        proc.window_diff = recording_diff
+        proc.frames = [frame, frame.copy()]
+        proc.preprocess_all_frames()
+        # A full-frame difference would break the tile memory bound and duplicate the proxy pass
+        assert (0, 0, 64, 64) not in windows
+        assert proc.skipped_frames == 0
+        assert proc.all_positions == [[]]
+
+
+def test_merge_rects_joins_overlapping_boxes():
+    from video_processing import merge_rects
+    merged = merge_rects([(0, 0, 10, 10), (5, 5, 10, 10), (30, 30, 2, 2)])
+    assert sorted(merged) == [(0, 0, 15, 15), (30, 30, 2, 2)]
+
+
+def test_coarse_to_fine_matches_full_resolution():
+    prev_frame = make_frame_with_rect((40, 40), (49, 49), size=(200, 120))
+    curr_frame = make_frame_with_rect((100, 60), (109, 69), size=(200, 120))
+    results = []
+    for scale in (1, 4):
+        proc = VideoProcessor(None, threshold_value=50, preview_label=None)
+        proc.min_speed = 1
+        proc.max_size = 200
+        proc.proxy_scale = scale
+        proc.prev_fast_positions = [(0, 0)]
+        boxes, _, _ = proc.detect_fast_objects(curr_frame, prev_frame)
+        results.append(sorted(boxes))
+    assert results[0] and results[0] == results[1]
+
+
+def test_preprocess_all_frames_with_stride_keeps_indices():
+    frames = [make_frame_with_rect((2 + 2 * i, 2), (5 + 2 * i, 5), size=(40, 20)) for i in range(5)]
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frame_stride = 2
+    proc.frames = frames
+    proc.preprocess_all_frames()
+    assert len(proc.all_positions) == len(frames) - 1
+    assert proc.all_positions[1] == [] and proc.all_positions[3] == []
+    assert proc.all_positions[2]
+
+
+def test_next_stride_adapts_to_measured_speed():
+    proc = VideoProcessor(None, threshold_value=5, preview_label=None)
+    proc.max_stride = 8
+    proc.min_speed = 20
+    assert proc.next_stride(1, None) == 2
+    assert proc.next_stride(8, None) == 8
+    assert proc.next_stride(8, float('inf')) == 1
+    assert proc.next_stride(1, 25) == 1
+    assert proc.next_stride(1, 5) == 4
+    assert proc.next_stride(4, 5) == 4  # steady motion keeps a steady stride
+
+
+def test_adaptive_stride_keeps_fast_mover_detections():
+    frames = [np.zeros((20, 200, 3), dtype=np.uint8) for _ in range(6)]
+    # Still frames, then a mover at 12 px per frame
+    frames += [make_frame_with_rect((2 + 12 * i, 2), (5 + 12 * i, 5), size=(200, 20)) for i in range(12)]
+    results = []
+    for adaptive in (False, True):
+        proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+        proc.min_speed = 10
+        proc.max_size = 200
+        proc.adaptive_stride = adaptive
+        proc.frames = frames
+        proc.preprocess_all_frames()
+        results.append(proc.all_positions)
+    # Once the mover is measured the stride is 1, so later pairs match stride 1 exactly
+    assert results[1][8:] == results[0][8:]
+    assert any(results[1][8:])
+
+
+def test_tiled_detection_matches_full_frame():
+    rng = np.random.default_rng(1)
+    prev_frame = np.zeros((150, 210, 3), dtype=np.uint8)
+    curr_frame = prev_frame.copy()
+    for _ in range(25):
+        x, y = rng.integers(0, 200), rng.integers(0, 140)
+        cv2.rectangle(curr_frame, (int(x), int(y)), (int(x) + 8, int(y) + 6), (255, 255, 255), -1)
+    # A blob straddling the seam between the first two tiles
+    cv2.rectangle(curr_frame, (60, 60), (70, 66), (255, 255, 255), -1)
+
+    results = []
+    for tile_size, workers in ((None, 1), (64, 1), (64, 3)):
+        proc = VideoProcessor(None, threshold_value=50, preview_label=None)
+        proc.tile_size = tile_size
+        proc.tile_overlap = 4
+        proc.tile_workers = workers
+        contours = proc.find_motion_contours(curr_frame, prev_frame)
+        results.append(sorted(cv2.boundingRect(c) for c in contours))
+    assert results[0] == results[1] == results[2]
+
+
+def test_tile_pool_follows_worker_count_and_ends_with_the_run():
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(60, 20)) for i in range(4)]
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.tile_size = 16
+    proc.tile_workers = 2
+    pool = proc.get_tile_pool()
+    assert proc.get_tile_pool() is pool
+    proc.tile_workers = 3
+    assert proc.get_tile_pool() is not pool
+
+    proc.frames = frames
+    proc.preprocess_all_frames()
+    assert proc._tile_pool is None
+
+
+def test_preprocess_all_frames_detects_slow_movers_with_one_model():
+    background = [np.zeros((60, 80, 3), dtype=np.uint8) for _ in range(10)]
+    moving = [make_frame_with_rect((20 + i, 20), (39 + i, 39), size=(80, 60)) for i in range(3)]
+    proc = DummyProcessor(None, threshold_value=16, preview_label=object())
+    proc.detect_slow = True
+    proc.slow_scale = 1
+    proc.frames = background + moving
+
+    created = []
+    original = proc.create_background_subtractor
+
+    def counting_create():
+        created.append(True)
+        original()
+
+    proc.create_background_subtractor = counting_create
+    proc.preprocess_all_frames()
+    assert len(created) == 1
+    assert len(proc.slow_positions) == len(proc.frames)
+    assert any(proc.slow_positions[len(background):])
+
+
+def test_undo_and_redo_erase_stroke():
+    frame = np.zeros((40, 40, 3), dtype=np.uint8)
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.frames = [frame, frame.copy(), frame.copy()]
+    original = [[(2, 2, 3, 3), (20, 20, 4, 4), (2, 2, 3, 3)], [(5, 5, 3, 3), (30, 30, 2, 2)]]
+    proc.all_positions = [list(p) for p in original]
+    proc.preprocessed_frames = [proc.render_preprocessed_preview()]
+
+    proc.begin_erase_stroke()
+    proc.remove_boxes_at(3, 3, radius=0)
+    proc.remove_boxes_at(6, 6, radius=0)
+    proc.end_erase_stroke()
+    assert proc.all_positions == [[(20, 20, 4, 4)], [(30, 30, 2, 2)]]
+    assert len(proc.erase_strokes) == 1
+    assert np.array_equal(proc.preprocessed_frames[0], proc.render_preprocessed_preview())
+
+    assert proc.undo_erase()
+    assert proc.all_positions == original
+    assert np.array_equal(proc.preprocessed_frames[0], proc.render_preprocessed_preview())
+    assert not proc.undo_erase()
+
+    assert proc.redo_erase()
+    assert proc.all_positions == [[(20, 20, 4, 4)], [(30, 30, 2, 2)]]
+    assert np.array_equal(proc.preprocessed_frames[0], proc.render_preprocessed_preview())
+    assert not proc.redo_erase()
+
+
+def test_stack_composite_lighten_and_darken():
+    frames = [np.full((10, 10, 3), v, dtype=np.uint8) for v in (50, 200, 10)]
+    frames[1][0, 0] = 0
+    proc = VideoProcessor(None, threshold_value=5, preview_label=None)
+    proc.frames = frames
+
+    lighten = proc.stack_composite('lighten')[0]
+    assert np.array_equal(lighten, np.maximum.reduce(frames))
+    darken = proc.stack_composite('darken')[0]
+    assert np.array_equal(darken, np.minimum.reduce(frames))
+    assert frames[0][0, 0, 0] == 50
+
+
+def test_stack_composite_boxes_only():
+    frames = [np.zeros((10, 10, 3), dtype=np.uint8), np.full((10, 10, 3), 255, dtype=np.uint8)]
+    proc = VideoProcessor(None, threshold_value=5, preview_label=None)
+    proc.frames = frames
+    proc.all_positions = [[], [(2, 2, 3, 3)]]
+    result = proc.stack_composite('lighten', boxes_only=True)[0]
+    assert result[2:5, 2:5].min() == 255
+    assert result.sum() == 255 * 9 * 3
+
+
+def test_stack_composite_streams_from_video(tmp_path):
+    video_file = tmp_path / "stack.avi"
+    writer = cv2.VideoWriter(str(video_file), cv2.VideoWriter_fourcc(*"MJPG"), 5, (16, 16))
+    for value in (20, 120, 60):
+        writer.write(np.full((16, 16, 3), value, dtype=np.uint8))
+    writer.release()
+
+    proc = VideoProcessor(str(video_file), threshold_value=5, preview_label=None)
+    result = proc.stack_composite('lighten')[0]
+    assert abs(int(result.mean()) - 120) <= 3
+
+
+def test_export_trail_video_writes_every_frame(tmp_path):
+    frames = [make_frame_with_rect((2 + 4 * i, 2), (5 + 4 * i, 5), size=(32, 16)) for i in range(4)]
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frames = frames
+    proc.fps = 10
+    proc.preprocess_all_frames()
+
+    video_file = tmp_path / "trail.avi"
+    result = proc.export_trail_video(str(video_file), queue_size=2)[0]
+    assert np.array_equal(result, proc.process_with_squares()[0])
+
+    cap = cv2.VideoCapture(str(video_file))
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    assert count == len(frames)
+
+
+def test_auto_calibrate_matches_detection_counts():
+    rng = np.random.default_rng(2)
+    frames = []
+    for i in range(8):
+        frame = rng.integers(0, 40, (40, 60, 3)).astype(np.uint8)
+        cv2.rectangle(frame, (4 + 6 * i, 10), (7 + 6 * i, 13), (255, 255, 255), -1)
+        frames.append(frame)
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.frames = frames
+    suggestion = proc.auto_calibrate(thresholds=[60, 120], min_speeds=[1, 8], max_sizes=[5, 100],
+                                     target_boxes=(0.5, 2.0))
+    assert suggestion['threshold'] in (60, 120)
+    assert suggestion['min_speed'] == 8 and suggestion['max_size'] == 100
+    assert 0.5 <= suggestion['boxes_per_pair'] <= 2.0
+
+    # The suggested settings give the predicted box count on a full run
+    proc.threshold_value = suggestion['threshold']
+    proc.min_speed = suggestion['min_speed']
+    proc.max_size = suggestion['max_size']
+    proc.idle_prefilter = False
+    proc.preprocess_all_frames()
+    counts = [len(p) for p in proc.all_positions[1:]]
+    assert np.isclose(np.mean(counts), suggestion['boxes_per_pair'])
+
+
+def test_auto_calibrate_ignores_sensor_noise_contours():
+    # Per-channel noise gives thousands of single-pixel contours per diff; they
+    # must be dropped before the speed sweep instead of being paired up
+    rng = np.random.default_rng(3)
+    frames = []
+    for i in range(5):
+        noise = rng.normal(0, 7, (270, 480, 3))
+        frame = np.clip(128 + noise, 0, 255).astype(np.uint8)
+        cv2.rectangle(frame, (20 + 30 * i, 100), (27 + 30 * i, 107), (255, 255, 255), -1)
+        frames.append(frame)
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.frames = frames
+
+    diff = cv2.absdiff(cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY), cv2.cvtColor(frames[1], cv2.COLOR_BGR2GRAY))
+    patches = proc.motion_patches(diff, 12)
+    _, thresh = cv2.threshold(diff, 12, 255, cv2.THRESH_BINARY)
+    assert len(cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]) > 3000
+    areas, centres = proc.contour_stats(patches, 12, max_area=500)
+    assert len(areas) == len(centres) < 10
+    assert np.all((areas > 5) & (areas < 500))
+
+    suggestion = proc.auto_calibrate(thresholds=[12, 60], min_speeds=[1, 10], max_sizes=[100, 500],
+                                     target_boxes=(0.5, 2.0))
+    assert suggestion is not None
+
+
+def test_count_fast_pairs_matches_pairwise_count():
+    from video_processing import VideoProcessor
+
+    rng = np.random.default_rng(4)
+    areas, prev_areas = rng.uniform(6, 300, 40), rng.uniform(6, 300, 30)
+    centres, prev_centres = rng.uniform(0, 100, (40, 2)), rng.uniform(0, 100, (30, 2))
+    # Unsorted sweeps must come back in the caller's order
+    max_sizes = np.array([200, 50, 300, 100])
+    min_speeds = np.array([30, 0, 60, 10])
+    counts = VideoProcessor.count_fast_pairs(areas, centres, prev_areas, prev_centres, max_sizes, min_speeds,
+                                             chunk=7)
+    distances = np.linalg.norm(centres[:, None] - prev_centres[None], axis=2)
+    for m, max_size in enumerate(max_sizes):
+        for s, min_speed in enumerate(min_speeds):
+            pairs = (areas[:, None] < max_size) & (prev_areas[None] < max_size) & (distances > min_speed)
+            assert counts[m, s] == pairs.sum()
+
+
+def test_classifier_scores_candidates_in_batches():
+    from detectors import CandidateClassifier
+
+    class BrightClassifier(CandidateClassifier):
+        crop_size = 8
+
+        def __init__(self):
+            self.batches = []
+
+        def score(self, crops):
+            self.batches.append(len(crops))
+            return (crops.reshape(len(crops), -1).max(axis=1) > 200).astype(float)
+
+    frames = [make_frame_with_rect((2 + 4 * i, 2), (5 + 4 * i, 5), size=(40, 20)) for i in range(6)]
+    for i, frame in enumerate(frames):
+        # A second mover makes filter_by_speed store each box once per previous centre
+        cv2.rectangle(frame, (2 + 4 * i, 12), (5 + 4 * i, 15), (255, 255, 255), -1)
+    baseline = DummyProcessor(None, threshold_value=5, preview_label=object())
+    baseline.min_speed = 1
+    baseline.max_size = 200
+    baseline.frames = frames
+    baseline.preprocess_all_frames()
+
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frames = frames
+    proc.classifier = BrightClassifier()
+    proc.classifier_batch_size = 4
+    proc.preprocess_all_frames()
+
+    total = sum(len(p) for p in baseline.all_positions)
+    distinct = sum(len(set(p)) for p in baseline.all_positions)
+    assert distinct < total
+    assert sum(proc.classifier.batches) == distinct
+    assert len(proc.classifier.batches) < distinct
+    assert proc.all_positions == baseline.all_positions
+
+    proc.classifier.score = lambda crops: np.zeros(len(crops))
+    proc.prev_fast_positions = []
+    proc.preprocess_all_frames()
+    assert not any(proc.all_positions)
+    assert proc.classified_out == total
+
+
+def test_torch_classifier_reports_missing_torch():
+    import importlib.util
+    import pytest
+    from detectors import TorchCropClassifier
+
+    if importlib.util.find_spec("torch") is not None:
+        pytest.skip("torch is installed")
+    with pytest.raises(ImportError):
+        TorchCropClassifier("model.pt")
+
+
+def test_progressive_preprocessing_matches_sequential():
+    rng = np.random.default_rng(4)
+    frames = []
+    for i in range(20):
+        frame = np.zeros((30, 90, 3), dtype=np.uint8)
+        x = int(rng.integers(0, 80))
+        cv2.rectangle(frame, (x, 5), (x + 4, 9), (255, 255, 255), -1)
+        frames.append(frame)
+
+    results = []
+    for progressive in (False, True):
+        proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+        proc.min_speed = 10
+        proc.max_size = 200
+        proc.progressive = progressive
+        proc.progressive_start = 4
+        proc.frames = frames
+        proc.preprocess_all_frames()
+        results.append(proc.all_positions)
+    assert results[0] == results[1]
+    assert any(results[1])
+
+
+def test_progressive_preprocessing_cancel_keeps_coarse_pass():
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(60, 20)) for i in range(17)]
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.progressive = True
+    proc.progressive_start = 8
+    proc.frames = frames
+
+    calls = 0
+
+    def should_cancel():
+        nonlocal calls
+        calls += 1
+        return calls > 2
+
+    proc.preprocess_all_frames(should_cancel=should_cancel)
+    assert len(proc.all_positions) == len(frames) - 1
+    assert proc.all_positions[8] and not proc.all_positions[4]
+    assert not proc.preprocess_complete
+    assert hasattr(proc, "preview_updated")
+
+
+def test_rerun_with_new_speed_and_size_reuses_pair_blobs():
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(60, 20)) for i in range(6)]
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frames = frames
+
+    calls = 0
+    motion_blobs = proc.motion_blobs
+
+    def counting_blobs(frame, prev_frame, frame_diff=None):
+        nonlocal calls
+        calls += 1
+        return motion_blobs(frame, prev_frame, frame_diff)
+
+    proc.motion_blobs = counting_blobs
+    proc.preprocess_all_frames()
+    first_calls = calls
+    assert first_calls and any(proc.all_positions)
+
+    proc.min_speed = 100
+    proc.preprocess_all_frames()
+    assert calls == first_calls
+    assert not any(proc.all_positions)
+
+    proc.threshold_value = 6
+    proc.preprocess_all_frames()
+    assert calls == 2 * first_calls
+
+
+def test_parallel_compositing_matches_serial():
+    rng = np.random.default_rng(7)
+    frames = [rng.integers(0, 256, (60, 80, 3), dtype=np.uint8) for _ in range(12)]
+    positions = []
+    for _ in range(11):
+        boxes = []
+        for _ in range(6):
+            x, y = int(rng.integers(0, 70)), int(rng.integers(0, 50))
+            boxes.append((x, y, int(rng.integers(3, 10)), int(rng.integers(3, 10))))
+        positions.append(boxes)
+
+    results = []
+    for workers in (1, 4):
+        proc = VideoProcessor(None, threshold_value=120, preview_label=None)
+        proc.frames = frames
+        proc.all_positions = positions
+        proc.composite_workers = workers
+        proc.composite_chunk = 5
+        results.append(proc.process_with_squares()[0])
+    assert np.array_equal(results[0], results[1])
+    assert not np.array_equal(results[0], frames[0])
+
+
+def test_realtime_mode_detects_at_source_rate():
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(80, 20)) for i in range(20)]
+    proc = VideoProcessor(None, threshold_value=5, preview_label=None)
+    proc.verbose = False
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frames = frames
+    proc.fps = 200
+    proc.latency_budget = 5
+
+    results = []
+    stats = proc.run_realtime(on_result=lambda index, boxes: results.append((index, boxes)))
+    assert stats['processed'] == len(frames)
+    assert stats['dropped'] == stats['degraded'] == stats['overflow'] == 0
+    assert [index for index, _ in results] == list(range(1, len(frames)))
+    assert any(boxes for _, boxes in results)
+    assert stats['latency_p50'] <= stats['latency_p95'] <= stats['latency_p99']
+
+
+def test_realtime_mode_applies_drop_policy_when_late():
+    import time
+
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(80, 20)) for i in range(20)]
+    for policy in ('skip', 'degrade'):
+        proc = VideoProcessor(None, threshold_value=5, preview_label=None)
+        proc.verbose = False
+        proc.frames = frames
+        proc.fps = 200
+        proc.latency_budget = 0.01
+        proc.drop_policy = policy
+        proc.realtime_queue_size = 32
+        scales = []
+
+        def slow_detect(frame, prev_frame):
+            scales.append(proc.proxy_scale)
+            time.sleep(0.02)
+            return [], [], frame
+
+        proc.detect_fast_objects = slow_detect
+        stats = proc.run_realtime()
+        assert stats['processed'] + stats['dropped'] + stats['overflow'] == len(frames)
+        if policy == 'skip':
+            assert stats['dropped'] > 0 and stats['degraded'] == 0
+        else:
+            assert stats['dropped'] == 0 and stats['degraded'] > 0
+            assert proc.degrade_scale in scales
+            assert proc.proxy_scale == 1
+
+
+def test_threshold_change_during_run_does_not_leave_stale_blobs():
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(60, 20)) for i in range(6)]
+
+    expected = DummyProcessor(None, threshold_value=5, preview_label=object())
+    expected.min_speed = 1
+    expected.max_size = 200
+    expected.frames = frames
+    expected.preprocess_all_frames()
+
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.frames = frames
+    motion_blobs = proc.motion_blobs
+
+    def slider_moves_mid_run(frame, prev_frame, frame_diff=None):
+        # The GUI thread raises the threshold while the first pair is being detected
+        proc.threshold_value = 255
+        return motion_blobs(frame, prev_frame, frame_diff)
+
+    proc.motion_blobs = slider_moves_mid_run
+    proc.preprocess_all_frames()
+    proc.motion_blobs = motion_blobs
+
+    proc.threshold_value = 5
+    proc.preprocess_all_frames()
+    assert proc.all_positions == expected.all_positions
+
+
+def test_idle_prefilter_never_skips_pairs_with_contours():
+    rng = np.random.default_rng(11)
+    proc = VideoProcessor(None, threshold_value=40, preview_label=None)
+    proc.verbose = False
+    for _ in range(300):
+        prev_frame = np.full((16, 16, 3), 128, dtype=np.uint8)
+        frame = prev_frame.copy()
+        # Brighten and darken pixels of one 4x4 block so their average barely moves
+        signs = rng.choice([-1, 1], size=(4, 4, 1))
+        change = signs * rng.integers(30, 60, size=(4, 4, 3))
+        frame[4:8, 4:8] = np.clip(128 + change, 0, 255).astype(np.uint8)
+        proc.frames = [prev_frame, frame]
+        idle, blobs = proc.pair_blobs(0, 1)
+        if proc.find_motion_contours(frame, prev_frame):
+            assert not idle
+        else:
+            assert idle and blobs == []
+
+
+def test_realtime_mode_raises_when_the_source_fails(tmp_path):
+    import pytest
+
+    proc = VideoProcessor(str(tmp_path / "missing.mp4"), threshold_value=5, preview_label=None)
+    proc.verbose = False
+    with pytest.raises(IOError):
+        proc.run_realtime()
+
+
+def test_realtime_mode_rejects_unknown_drop_policy(tmp_path):
+    import pytest
+
+    proc = VideoProcessor(str(tmp_path / "missing.mp4"), threshold_value=5, preview_label=None)
+    proc.verbose = False
+    proc.drop_policy = 'drop'
+    # Rejected before the source is opened, so the missing file never matters
+    with pytest.raises(ValueError, match="drop_policy"):
+        proc.run_realtime()
+
+
+def test_progressive_preview_goes_through_signal():
+    frames = [make_frame_with_rect((2 + 3 * i, 2), (5 + 3 * i, 5), size=(60, 20)) for i in range(17)]
+    proc = DummyProcessor(None, threshold_value=5, preview_label=object())
+    proc.min_speed = 1
+    proc.max_size = 200
+    proc.progressive = True
+    proc.progressive_start = 8
+    proc.frames = frames
+    emitted = []
+    proc.preview_signal = types.SimpleNamespace(emit=emitted.append)
+
+    proc.preprocess_all_frames()
+    assert not hasattr(proc, "preview_updated")
+    assert len(emitted) == 4  # one per coarse pass plus the final frame
+    assert np.array_equal(emitted[-1], proc.preprocessed_frames[-1])
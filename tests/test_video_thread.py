@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtCore import Qt
+
+# Ensure the project root is on the Python path so video_thread can be imported
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from video_thread import VideoProcessingThread
+
+
+class BlockingProcessor:
+    """Records each job and holds the first one until released."""
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.jobs = []
+
+    def process_with_squares(self, green_boxes, red_boxes, should_cancel=None):
+        self.jobs.append(green_boxes)
+        self.started.set()
+        if len(self.jobs) == 1:
+            while not self.release.is_set() and not should_cancel():
+                self.release.wait(0.01)
+        return [green_boxes]
+
+
+def test_submit_coalesces_jobs_and_reports_latest_only():
+    processor = BlockingProcessor()
+    thread = VideoProcessingThread()
+    results = []
+    thread.finished.connect(lambda mode, result: results.append((mode, result)), Qt.DirectConnection)
+
+    thread.submit(processor, 'process', green_boxes='first')
+    assert processor.started.wait(2)
+    thread.submit(processor, 'process', green_boxes='second')
+    thread.submit(processor, 'process', green_boxes='third')
+
+    for _ in range(200):
+        if results:
+            break
+        thread.wait(10)
+    thread.stop()
+
+    assert processor.jobs == ['first', 'third']
+    assert results == [('process', ['third'])]
+    assert thread.superseded_jobs == 2
+
+
+class FailingProcessor:
+    def process_with_squares(self, green_boxes, red_boxes, should_cancel=None):
+        if green_boxes == 'fail':
+            raise ValueError("broken job")
+        return [green_boxes]
+
+
+def test_failed_job_is_reported_and_worker_keeps_serving():
+    processor = FailingProcessor()
+    thread = VideoProcessingThread()
+    results = []
+    failures = []
+    thread.finished.connect(lambda mode, result: results.append(result), Qt.DirectConnection)
+    thread.failed.connect(lambda mode, message: failures.append((mode, message)), Qt.DirectConnection)
+
+    thread.submit(processor, 'process', green_boxes='fail')
+    for _ in range(200):
+        if failures:
+            break
+        thread.wait(10)
+    thread.submit(processor, 'process', green_boxes='ok')
+    for _ in range(200):
+        if results:
+            break
+        thread.wait(10)
+    thread.stop()
+
+    assert failures == [('process', 'broken job')]
+    assert results == [['ok']]
+    assert not thread.busy
+
+
+def test_trail_job_with_unwritable_path_reports_failure(tmp_path):
+    import numpy as np
+    from video_processing import VideoProcessor
+
+    processor = VideoProcessor(None, threshold_value=5, preview_label=None)
+    processor.verbose = False
+    processor.frames = [np.zeros((16, 16, 3), dtype=np.uint8) for _ in range(3)]
+    processor.all_positions = [[], []]
+    thread = VideoProcessingThread()
+    failures = []
+    thread.failed.connect(lambda mode, message: failures.append(mode), Qt.DirectConnection)
+
+    thread.submit(processor, 'trail', output_path=str(tmp_path / "missing" / "trail.mp4"))
+    for _ in range(200):
+        if failures:
+            break
+        thread.wait(10)
+    thread.stop()
+    assert failures == ['trail']
@@ -1,9 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import time
+
 import cv2
 import numpy as np
+from export import BackgroundVideoWriter
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
 
+
+def merge_rects(rects):
+    """Merge overlapping or touching (x, y, w, h) rectangles into their bounding boxes."""
+    merged = [list(r) for r in rects]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for x, y, w, h in merged:
+            for other in result:
+                ox, oy, ow, oh = other
+                if x <= ox + ow and ox <= x + w and y <= oy + oh and oy <= y + h:
+                    nx, ny = min(x, ox), min(y, oy)
+                    other[:] = [nx, ny, max(x + w, ox + ow) - nx, max(y + h, oy + oh) - ny]
+                    changed = True
+                    break
+            else:
+                result.append([x, y, w, h])
+        merged = result
+    return [tuple(r) for r in merged]
+
+
+def touches_window_edge(rect, window, frame_size):
+    """Return True if rect reaches an edge of window that is not also the frame border."""
+    bx, by, bw, bh = rect
+    x, y, w, h = window
+    frame_width, frame_height = frame_size
+    return ((bx <= x and x > 0) or (by <= y and y > 0) or
+            (bx + bw >= x + w and x + w < frame_width) or
+            (by + bh >= y + h and y + h < frame_height))
+
+
+def rect_inside(rect, window):
+    """Return True if rect lies entirely within window."""
+    x, y, w, h = rect
+    wx, wy, ww, wh = window
+    return wx <= x and wy <= y and x + w <= wx + ww and y + h <= wy + wh
+
+
 class VideoProcessor:
 
     def __init__(self, video_path, threshold_value, preview_label, progress_signal=None, verbose=False):
@@ -12,12 +57,78 @@ class VideoProcessor:
         self.threshold_value = threshold_value
         self.preview_label = preview_label
         self.progress_signal = progress_signal
+        # When set, preview frames from worker threads are emitted through this
+        # signal for the GUI thread to draw instead of touching preview_label
+        self.preview_signal = None
         self.verbose = verbose
         self.frames = []
+        self.fps = None
         self.min_speed = 750
         self.max_size = 150
         self.object_positions = []
         self.all_positions = []
+        # Idle prefilter: frame pairs whose largest grey difference never reaches
+        # idle_threshold are skipped before thresholding and contour detection.
+        # It reuses the full-frame difference, so tiled and proxy runs skip it.
+        self.idle_prefilter = True
+        self.idle_threshold = None  # None derives it from threshold_value
+        self.skipped_frames = 0
+        # Coarse-to-fine detection: blobs are found on a proxy downscaled by
+        # proxy_scale (1 disables) and refined in full-resolution windows.
+        self.proxy_scale = 1
+        self.proxy_threshold_ratio = 0.5
+        self.proxy_margin = 4
+        # Frame stride: compare frame i with frame i + frame_stride. With
+        # adaptive_stride the stride follows the measured per-frame motion:
+        # it grows through still or slow stretches, up to max_stride, and drops
+        # to 1 while anything moves fast enough to pass min_speed.
+        self.frame_stride = 1
+        self.adaptive_stride = False
+        self.max_stride = 8
+        # Tiled detection: frames are processed in tile_size squares padded by
+        # tile_overlap (None disables), optionally on tile_workers threads.
+        self.tile_size = None
+        self.tile_overlap = 32
+        self.tile_workers = 1
+        self._tile_pool = None
+        self._tile_pool_workers = None
+        # Slow movers: a persistent MOG2 model, fed once per processed frame at
+        # 1/slow_scale resolution, finds foreground blobs the frame difference misses.
+        self.detect_slow = False
+        self.slow_scale = 2
+        self.slow_min_area = 50
+        self.slow_positions = []
+        # Eraser history: each stroke is a list of (frame index, slot, box) deltas
+        self.erase_strokes = []
+        self.redo_strokes = []
+        self._current_stroke = None
+        self.preprocess_complete = False
+        # Optional second-stage classifier (see detectors.CandidateClassifier);
+        # candidates are scored in batches spanning many frames.
+        self.classifier = None
+        self.classifier_batch_size = 64
+        self.classifier_threshold = 0.5
+        self.classified_out = 0
+        self._classifier_queue = []
+        # Blobs per frame pair, reused by reruns whose settings leave them unchanged
+        self._candidate_cache = {}
+        self._candidate_cache_key = None
+        # Progressive preprocessing: visit every progressive_start-th pair first,
+        # then halve the spacing each pass, updating the preview after each pass
+        self.progressive = False
+        self.progressive_start = 64
+        # Compositing: object masks are extracted on composite_workers threads,
+        # composite_chunk frames at a time, and pasted in frame order
+        self.composite_workers = 1
+        self.composite_chunk = 32
+        # Real-time mode: frames arrive at the source fps through a queue of
+        # realtime_queue_size; a frame waiting longer than latency_budget seconds
+        # is dropped ('skip') or detected on a degrade_scale proxy ('degrade').
+        self.latency_budget = 0.1
+        self.drop_policy = 'skip'
+        self.degrade_scale = 4
+        self.realtime_queue_size = 4
+        self.realtime_stats = None
         self.fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=threshold_value, detectShadows=False)
 
     def load_video(self):
@@ -31,7 +142,8 @@ class VideoProcessor:
             raise IOError(f"Error opening video file {self.video_path}")
 
         self.frames = []
-        #fps = cap.get(cv2.CAP_PROP_FPS)
+        self._candidate_cache = {}
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or None
         success, frame = cap.read()
         while success:
             self.frames.append(frame)
@@ -42,6 +154,25 @@ class VideoProcessor:
         if self.verbose:
             print(f"Loaded {len(self.frames)} frames successfully.")
 
+    def iter_frames(self):
+        """
+        Yield frames from memory if loaded, otherwise decode them from the video
+        into a single reused buffer. Copy a yielded frame before keeping it.
+        """
+        if self.frames:
+            yield from self.frames
+            return
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise IOError(f"Error opening video file {self.video_path}")
+        try:
+            success, frame = cap.read()
+            while success:
+                yield frame
+                success, frame = cap.read(frame)
+        finally:
+            cap.release()
+
     def extract_object_region(self, frame, x, y, w, h):
         """
         Extracts an object region from the frame within the given bounding box.
@@ -65,70 +196,530 @@ class VideoProcessor:
     def process_with_squares(self, green_boxes=None, red_boxes=None, should_cancel=None):
         """
         Processes all detected objects across frames and combines them into the final image.
+        With composite_workers > 1 the masks are extracted on a thread pool, but they
+        are still pasted in frame order, so the result matches the serial path exactly.
         """
         final_image = self.frames[0].copy()
+        frame_count = len(self.all_positions)
 
-        # for each recorded frame's positions start from the second frame
-        for i, frame_positions in enumerate(self.all_positions):
-            if should_cancel and should_cancel():
-                break
-            current_frame = self.frames[i].copy()
-            #temp_image = final_image.copy()
+        if self.composite_workers <= 1:
+            # for each recorded frame's positions start from the second frame
+            for i in range(frame_count):
+                if should_cancel and should_cancel():
+                    break
+                self.paste_frame_objects(final_image, i)
+            return [final_image]
 
-            # Process all detected positions for this frame
-            for x, y, w, h in frame_positions:
-                try:
-                    object_region = self.extract_object_region(current_frame, x, y, w, h)
-                    if object_region is not None:
-                        final_image[y:y + h, x:x + w] = object_region
-                except Exception as e:
-                    print(f"Error processing object at frame {i}, box ({x}, {y}, {w}, {h}): {e}")
+        chunk = max(1, self.composite_chunk)
+        with ThreadPoolExecutor(max_workers=self.composite_workers) as pool:
+            # Chunks bound how many extracted regions are held at once
+            for start in range(0, frame_count, chunk):
+                if should_cancel and should_cancel():
+                    break
+                indices = range(start, min(start + chunk, frame_count))
+                for regions in pool.map(self.frame_object_regions, indices):
+                    self.paste_regions(final_image, regions)
 
         return [final_image]
 
+    def paste_frame_objects(self, final_image, i):
+        """Paste the objects detected in frame i onto final_image."""
+        self.paste_regions(final_image, self.frame_object_regions(i))
+
+    def frame_object_regions(self, i):
+        """Return (x, y, w, h, region) for each object found in frame i's boxes."""
+        current_frame = self.frames[i]
+        regions = []
+
+        # Process all detected positions for this frame
+        for x, y, w, h in self.all_positions[i]:
+            try:
+                object_region = self.extract_object_region(current_frame, x, y, w, h)
+                if object_region is not None:
+                    regions.append((x, y, w, h, object_region))
+            except Exception as e:
+                print(f"Error processing object at frame {i}, box ({x}, {y}, {w}, {h}): {e}")
+        return regions
+
+    @staticmethod
+    def paste_regions(final_image, regions):
+        for x, y, w, h, object_region in regions:
+            try:
+                final_image[y:y + h, x:x + w] = object_region
+            except Exception as e:
+                print(f"Error pasting object at box ({x}, {y}, {w}, {h}): {e}")
+
+    def export_trail_video(self, output_path, should_cancel=None, queue_size=4):
+        """
+        Write a video whose frame i shows the pasted-box composite up to frame i.
+        Encoding runs on a background thread fed through a bounded queue, so it
+        overlaps with compositing and only a few frames are held at once.
+        """
+        height, width = self.frames[0].shape[:2]
+        writer = BackgroundVideoWriter(output_path, self.fps or 30, (width, height), queue_size=queue_size)
+        writer.start()
+        final_image = self.frames[0].copy()
+        frame_count = len(self.all_positions)
+        try:
+            writer.write(final_image.copy())
+            for i in range(frame_count):
+                if should_cancel and should_cancel():
+                    break
+                self.paste_frame_objects(final_image, i)
+                writer.write(final_image.copy())
+                if self.progress_signal:
+                    self.progress_signal.emit(int((i + 1) / frame_count * 100))
+        finally:
+            writer.close()
+        if self.verbose:
+            print(f"Wrote {writer.frames_written} trail frames to {output_path}")
+        return [final_image]
+
+
+    def stack_composite(self, mode='lighten', boxes_only=False, should_cancel=None):
+        """
+        Combine all frames in one streaming pass into a per-pixel maximum ('lighten')
+        or minimum ('darken') stack. With boxes_only, frames only contribute inside
+        their detected boxes. The accumulator is updated in place, so nothing is
+        allocated per frame.
+        """
+        stack = np.maximum if mode == 'lighten' else np.minimum
+        frame_count = len(self.frames)
+        accumulator = None
+        for i, frame in enumerate(self.iter_frames()):
+            if should_cancel and should_cancel():
+                break
+            if accumulator is None:
+                accumulator = frame.copy()
+                continue
+            if boxes_only:
+                if i < len(self.all_positions):
+                    for x, y, w, h in self.all_positions[i]:
+                        region = accumulator[y:y + h, x:x + w]
+                        stack(region, frame[y:y + h, x:x + w], out=region)
+            else:
+                stack(accumulator, frame, out=accumulator)
+
+            if self.progress_signal and frame_count:
+                self.progress_signal.emit(int((i + 1) / frame_count * 100))
+        return [accumulator]
 
     def detect_fast_objects(self, frame, prev_frame):
         if self.prev_fast_positions is None:
             self.prev_fast_positions = []
 
-        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        prev_grey = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
+        candidates = self.fast_candidates(frame, prev_frame)
+        fast_positions = self.filter_by_speed(candidates, self.prev_fast_positions)
+        self.prev_fast_positions = [centre for centre, _ in candidates]  # update positions for next frame
 
-        # Compute frame difference for fast movers detection
-        frame_diff = cv2.absdiff(prev_grey, grey)
-        _, thresh = cv2.threshold(frame_diff, self.threshold_value, 255, cv2.THRESH_BINARY)
+        return fast_positions, [], frame
 
-        # Detect contours for both fast and slow movers
-        contours_fast, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def fast_candidates(self, frame, prev_frame):
+        """Return (centre, box) for every moving blob of a plausible size in the pair."""
+        return [(centre, box) for centre, box, area in self.motion_blobs(frame, prev_frame) if area < self.max_size]
+
+    def motion_blobs(self, frame, prev_frame, frame_diff=None):
+        """
+        Return (centre, box, area) for every moving blob larger than the noise
+        floor. frame_diff is the full-frame grey difference when already computed.
+        """
+        # Detect contours of fast movers from the frame difference
+        contours_fast = self.find_motion_contours(frame, prev_frame, frame_diff)
 
         if self.verbose:
             print(f"Contours detected (fast): {len(contours_fast)}")
 
-        fast_positions = []
-        #slow_positions = []
-        current_fast_positions = []  # Store positions in the current frame
-
-        for i, contour in enumerate(contours_fast):
+        blobs = []
+        for contour in contours_fast:
             area = cv2.contourArea(contour)
-            if 5 < area < self.max_size:  # Ensure reasonable area range
-                if self.verbose:
-                    print(f"Fast contour area: {area}, max size: {self.max_size}")
+            if 5 < area:  # max_size is applied by the caller
                 x, y, w, h = cv2.boundingRect(contour)
-                current_fast_positions.append(((x + w / 2, y + h / 2), (w, h), i))  # Store center and dimensions
-
-        # Calculate speeds based on previous frame data
-        for (cx, cy), (w, h), i in current_fast_positions:
-            if self.prev_fast_positions:
-                for prev_cx, prev_cy in self.prev_fast_positions:
-                    speed = np.linalg.norm(np.array([cx, cy]) - np.array([prev_cx, prev_cy]))
-                    if speed > self.min_speed:
-                        if self.verbose:
-                            print(f"Object speed: {speed}, min speed: {self.min_speed}")
-                        x, y, w, h = cv2.boundingRect(contours_fast[i])
-                        fast_positions.append((x, y, w, h))
-        self.prev_fast_positions = [pos[0] for pos in current_fast_positions] # update positions for next frame
+                blobs.append(((x + w / 2, y + h / 2), (x, y, w, h), area))  # Store center, box and area
+        return blobs
 
-        return fast_positions, [], frame
+    def candidate_cache_key(self):
+        """Settings that change which blobs a frame pair yields."""
+        return (self.threshold_value, self.proxy_scale, self.proxy_threshold_ratio, self.proxy_margin,
+                self.tile_size, self.idle_prefilter, self.get_idle_threshold())
+
+    def prepare_candidate_cache(self):
+        """Keep cached blobs across runs, dropping them all once a setting they depend on changes."""
+        key = self.candidate_cache_key()
+        if key != self._candidate_cache_key:
+            self._candidate_cache = {}
+            self._candidate_cache_key = key
+
+    def pair_candidates(self, prev_index, index):
+        """
+        Return (centre, box) candidates for the frame pair, filtered by max_size.
+        Blobs are cached per pair, so a rerun after changing only min_speed or
+        max_size does no image work at all.
+        """
+        key = (prev_index, index)
+        # The GUI can change settings while a run is in progress, so each entry
+        # records the settings it was computed with and is only stored if they
+        # held for the whole computation.
+        settings = self.candidate_cache_key()
+        cached = self._candidate_cache.get(key)
+        if cached is not None and cached[0] == settings:
+            _, idle, blobs = cached
+        else:
+            idle, blobs = self.pair_blobs(prev_index, index)
+            if self.candidate_cache_key() == settings:
+                self._candidate_cache[key] = (settings, idle, blobs)
+        if idle:
+            # Nothing crosses the threshold, so full detection would find no contours
+            self.skipped_frames += 1
+            return []
+        return [(centre, box) for centre, box, area in blobs if area < self.max_size]
+
+    def pair_blobs(self, prev_index, index):
+        """
+        Return (idle, blobs) for a frame pair. On full-frame runs the grey
+        difference is checked against the idle threshold first and then reused
+        for detection, so the prefilter costs one scan of the difference.
+        """
+        frame, prev_frame = self.frames[index], self.frames[prev_index]
+        if not self.idle_prefilter or self.tile_size or self.proxy_scale > 1:
+            return False, self.motion_blobs(frame, prev_frame)
+        height, width = frame.shape[:2]
+        frame_diff = self.window_diff(frame, prev_frame, (0, 0, width, height))
+        if self.is_idle_diff(frame_diff):
+            return True, []
+        return False, self.motion_blobs(frame, prev_frame, frame_diff)
+
+    def filter_by_speed(self, candidates, prev_centres):
+        """
+        Return the box of each candidate once for every previous centre it is
+        more than min_speed away from, in candidate order.
+        """
+        if not candidates or not prev_centres:
+            return []
+        centres = np.array([centre for centre, _ in candidates], dtype=float)
+        distances = np.linalg.norm(centres[:, None, :] - np.asarray(prev_centres, dtype=float)[None, :, :], axis=2)
+        rows, _ = np.nonzero(distances > self.min_speed)
+        if self.verbose and len(rows):
+            print(f"Fast objects: {len(rows)}, min speed: {self.min_speed}")
+        return [candidates[row][1] for row in rows]
+
+    def auto_calibrate(self, sample_pairs=200, thresholds=None, min_speeds=None, max_sizes=None,
+                       target_boxes=(0.1, 3.0), should_cancel=None):
+        """
+        Suggest threshold, min_speed and max_size from a sample of frame pairs.
+
+        Frame differences for the sampled pairs are computed once, cropped to
+        their moving regions and reused for every threshold; the min_speed and
+        max_size sweeps are then counted from the contour areas and centres,
+        exactly as detect_fast_objects would. Among settings giving target_boxes
+        boxes per pair, the one whose count changes least under neighbouring
+        settings wins.
+        Returns a dict with the suggested values, or None if cancelled.
+        """
+        thresholds = np.arange(20, 251, 10) if thresholds is None else np.asarray(thresholds)
+        min_speeds = np.arange(0, 1501, 50) if min_speeds is None else np.asarray(min_speeds)
+        max_sizes = np.arange(25, 1001, 25) if max_sizes is None else np.asarray(max_sizes)
+        frame_count = len(self.frames)
+        if frame_count < 3:
+            raise ValueError("Auto-calibration needs at least three frames")
+
+        # Each sample is two consecutive pairs, since speeds are measured against
+        # the contours of the previous pair
+        centres = np.unique(np.linspace(1, frame_count - 2, min(sample_pairs, frame_count - 2)).astype(int))
+        greys = {}
+        for i in centres:
+            for j in (i - 1, i, i + 1):
+                if j not in greys:
+                    greys[j] = cv2.cvtColor(self.frames[j], cv2.COLOR_BGR2GRAY)
+        # Blobs at any threshold lie inside blobs at the lowest one, so each
+        # difference is cropped once to those windows before the sweep
+        lowest = int(np.min(thresholds))
+        diffs = [(self.motion_patches(cv2.absdiff(greys[i - 1], greys[i]), lowest),
+                  self.motion_patches(cv2.absdiff(greys[i], greys[i + 1]), lowest)) for i in centres]
+        del greys
+
+        # Contours outside (5, largest max_size) never count in either role
+        max_area = float(np.max(max_sizes))
+        totals = np.zeros((len(thresholds), len(max_sizes), len(min_speeds)))
+        for t, threshold in enumerate(thresholds):
+            if should_cancel and should_cancel():
+                return None
+            for prev_diff, diff in diffs:
+                prev_areas, prev_centres = self.contour_stats(prev_diff, threshold, max_area)
+                areas, centres_xy = self.contour_stats(diff, threshold, max_area)
+                if not len(areas) or not len(prev_areas):
+                    continue
+                totals[t] += self.count_fast_pairs(areas, centres_xy, prev_areas, prev_centres, max_sizes, min_speeds)
+            if self.progress_signal:
+                self.progress_signal.emit(int((t + 1) / len(thresholds) * 100))
+
+        boxes_per_pair = totals / len(diffs)
+        log_counts = np.log1p(boxes_per_pair)
+        instability = np.zeros_like(log_counts)
+        neighbours = np.zeros_like(log_counts)
+        for axis in range(3):
+            change = np.abs(np.diff(log_counts, axis=axis))
+            for side in (0, 1):
+                index = [slice(None)] * 3
+                index[axis] = slice(1, None) if side else slice(None, -1)
+                instability[tuple(index)] += change
+                neighbours[tuple(index)] += 1
+        instability /= np.maximum(neighbours, 1)
+
+        low, high = target_boxes
+        in_band = (boxes_per_pair >= low) & (boxes_per_pair <= high)
+        if in_band.any():
+            best = np.unravel_index(np.argmin(np.where(in_band, instability, np.inf)), instability.shape)
+        else:
+            miss = np.maximum(np.log(low + 1e-9) - np.log(boxes_per_pair + 1e-9), 0) + \
+                np.maximum(np.log(boxes_per_pair + 1e-9) - np.log(high), 0)
+            best = np.unravel_index(np.argmin(miss), miss.shape)
+
+        t, m, sp = best
+        suggestion = {
+            'threshold': int(thresholds[t]),
+            'min_speed': int(min_speeds[sp]),
+            'max_size': int(max_sizes[m]),
+            'boxes_per_pair': float(boxes_per_pair[best]),
+            'sampled_pairs': len(diffs),
+        }
+        if self.verbose:
+            print(f"Auto-calibration suggestion: {suggestion}")
+        return suggestion
+
+    def motion_patches(self, frame_diff, threshold):
+        """Crop a frame difference to the disjoint windows holding its blobs at threshold."""
+        _, thresh = cv2.threshold(frame_diff, threshold, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        windows = merge_rects([cv2.boundingRect(c) for c in contours])
+        return [(frame_diff[y:y + h, x:x + w].copy(), (x, y)) for x, y, w, h in windows]
+
+    def contour_stats(self, patches, threshold, max_area=np.inf):
+        """
+        Return the areas and bounding-box centres of contours in thresholded
+        difference patches, keeping only areas detection can use (above 5 and
+        below max_area).
+        """
+        contours = []
+        for patch, offset in patches:
+            _, thresh = cv2.threshold(patch, int(threshold), 255, cv2.THRESH_BINARY)
+            contours.extend(cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)[0])
+        areas = np.array([cv2.contourArea(c) for c in contours]).reshape(-1)
+        keep = np.nonzero((areas > 5) & (areas < max_area))[0]
+        rects = np.array([cv2.boundingRect(contours[k]) for k in keep], dtype=float).reshape(-1, 4)
+        centres = rects[:, :2] + rects[:, 2:] / 2
+        return areas[keep], centres
+
+    @staticmethod
+    def count_fast_pairs(areas, centres, prev_areas, prev_centres, max_sizes, min_speeds, chunk=256):
+        """
+        Return a (max_size, min_speed) array counting the (contour, previous contour)
+        pairs whose areas are both below max_size and whose centres are more than
+        min_speed apart, as filter_by_speed counts them. Each pair is binned once by
+        the smallest max_size admitting it and the number of min_speeds it beats,
+        and cumulative sums turn the bins into counts, so memory stays at one chunk
+        of distances.
+        """
+        size_order = np.argsort(max_sizes, kind='stable')
+        speed_order = np.argsort(min_speeds, kind='stable')
+        sizes = np.asarray(max_sizes, dtype=float)[size_order]
+        speeds = np.asarray(min_speeds, dtype=float)[speed_order]
+        bins = np.zeros((len(sizes) + 1) * (len(speeds) + 1), dtype=np.int64)
+        prev_areas = np.asarray(prev_areas, dtype=float)
+        for start in range(0, len(areas), chunk):
+            rows = slice(start, start + chunk)
+            distances = np.linalg.norm(centres[rows, None, :] - prev_centres[None, :, :], axis=2)
+            larger = np.maximum(areas[rows, None], prev_areas[None, :])
+            # First max_size above both areas, and how many min_speeds the distance beats
+            size_bin = np.searchsorted(sizes, larger, side='right')
+            speed_bin = np.searchsorted(speeds, distances, side='left')
+            bins += np.bincount((size_bin * (len(speeds) + 1) + speed_bin).ravel(), minlength=len(bins))
+        bins = bins.reshape(len(sizes) + 1, len(speeds) + 1)
+        # Pairs beating more than s speeds count for speed s; admitted by size m and all larger
+        beats = np.cumsum(bins[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        counts = np.cumsum(beats, axis=0)[:len(sizes)]
+        result = np.empty_like(counts)
+        result[np.ix_(size_order, speed_order)] = counts
+        return result
+
+    def make_proxy(self, frame, scale):
+        """Return a greyscale copy of the frame downscaled by the given factor."""
+        # Halving repeatedly is much faster in OpenCV than one large INTER_AREA step
+        while scale % 2 == 0:
+            frame = cv2.resize(frame, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+            scale //= 2
+        if scale > 1:
+            frame = cv2.resize(frame, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def get_idle_threshold(self):
+        """
+        Minimum grey difference for a pair to count as active. Detection keeps
+        pixels above threshold_value, so the default of threshold_value + 1 only
+        skips pairs it would find nothing in; a larger idle_threshold trades
+        recall for speed.
+        """
+        if self.idle_threshold is not None:
+            return self.idle_threshold
+        return self.threshold_value + 1
+
+    def is_idle_diff(self, frame_diff):
+        """Return True if no pixel of a grey difference changed enough to be worth detecting."""
+        _, max_diff, _, _ = cv2.minMaxLoc(frame_diff)
+        return max_diff < self.get_idle_threshold()
+
+    def find_motion_contours(self, frame, prev_frame, frame_diff=None):
+        """
+        Return full-resolution contours of pixels that changed by more than
+        threshold_value. A precomputed full-frame grey difference is reused.
+        """
+        if self.proxy_scale > 1:
+            return self.find_contours_coarse_to_fine(frame, prev_frame)
+        if self.tile_size:
+            return self.find_contours_tiled(frame, prev_frame)
+        height, width = frame.shape[:2]
+        if frame_diff is None:
+            return self.find_contours_in_window(frame, prev_frame, (0, 0, width, height))
+        return self.contours_in_diff(frame_diff, (0, 0))
+
+    def window_diff(self, frame, prev_frame, window):
+        """Return the grey absolute difference of the pair inside an (x, y, w, h) window."""
+        x, y, w, h = window
+        grey = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        prev_grey = cv2.cvtColor(prev_frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        return cv2.absdiff(prev_grey, grey)
+
+    def contours_in_diff(self, frame_diff, offset):
+        """Threshold a grey difference and return its contours shifted by offset."""
+        _, thresh = cv2.threshold(frame_diff, self.threshold_value, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+        return list(contours)
+
+    def find_contours_in_window(self, frame, prev_frame, window):
+        """Threshold the difference inside an (x, y, w, h) window; contours are in frame coordinates."""
+        x, y = window[:2]
+        return self.contours_in_diff(self.window_diff(frame, prev_frame, window), (x, y))
+
+    def find_contours_coarse_to_fine(self, frame, prev_frame):
+        """
+        Find candidate blobs on proxies downscaled by proxy_scale, then refine each
+        candidate in a full-resolution window so stored boxes keep full precision.
+        """
+        scale = self.proxy_scale
+        height, width = frame.shape[:2]
+        proxy = self.make_proxy(frame, scale)
+        prev_proxy = self.make_proxy(prev_frame, scale)
+
+        # Averaging dilutes small blobs, so the proxy uses a lower threshold
+        frame_diff = cv2.absdiff(prev_proxy, proxy)
+        _, thresh = cv2.threshold(frame_diff, self.threshold_value * self.proxy_threshold_ratio, 255, cv2.THRESH_BINARY)
+        coarse_contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        windows = []
+        margin = self.proxy_margin
+        for contour in coarse_contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            x0 = max(0, x * scale - margin)
+            y0 = max(0, y * scale - margin)
+            x1 = min(width, (x + w) * scale + margin)
+            y1 = min(height, (y + h) * scale + margin)
+            windows.append((x0, y0, x1 - x0, y1 - y0))
+
+        contours = self.refine_windows(frame, prev_frame, windows)
+        if self.verbose:
+            print(f"Coarse candidates: {len(coarse_contours)}, refined contours: {len(contours)}")
+        return contours
+
+    def refine_windows(self, frame, prev_frame, windows, covered=None):
+        """
+        Find the contours inside each window at full resolution. Windows are merged
+        where they overlap, and a window whose contours run into its edge is grown
+        and searched again, so every returned contour is a complete blob. The final
+        windows are appended to covered when a list is given.
+        """
+        height, width = frame.shape[:2]
+        contours = {}
+        pending = merge_rects(windows)
+        while pending:
+            grow = []
+            for window in pending:
+                found = self.find_contours_in_window(frame, prev_frame, window)
+                if any(touches_window_edge(cv2.boundingRect(c), window, (width, height)) for c in found):
+                    x, y, w, h = window
+                    pad = max(self.proxy_margin, w // 2, h // 2)
+                    x0, y0 = max(0, x - pad), max(0, y - pad)
+                    grow.append((x0, y0, min(width, x + w + pad) - x0, min(height, y + h + pad) - y0))
+                else:
+                    if covered is not None:
+                        covered.append(window)
+                    for contour in found:
+                        contours.setdefault(cv2.boundingRect(contour), contour)
+            pending = merge_rects(grow)
+        return list(contours.values())
+
+    def get_tile_pool(self):
+        """Return the tile pool, recreating it if tile_workers has changed."""
+        if self._tile_pool is not None and self._tile_pool_workers != self.tile_workers:
+            self.shutdown_tile_pool()
+        if self._tile_pool is None:
+            self._tile_pool = ThreadPoolExecutor(max_workers=self.tile_workers)
+            self._tile_pool_workers = self.tile_workers
+        return self._tile_pool
+
+    def shutdown_tile_pool(self):
+        if self._tile_pool is not None:
+            self._tile_pool.shutdown()
+            self._tile_pool = None
+
+    def find_contours_tiled(self, frame, prev_frame):
+        """
+        Detect contours tile by tile so peak memory is bounded by the tile size.
+        A blob is kept by the tile whose core holds its top-left corner; blobs cut
+        by a tile's padded edge are merged across tiles and re-detected whole.
+        """
+        height, width = frame.shape[:2]
+        tile, overlap = self.tile_size, self.tile_overlap
+        cores = [(x, y, min(tile, width - x), min(tile, height - y))
+                 for y in range(0, height, tile) for x in range(0, width, tile)]
+
+        def detect_tile(core):
+            x, y, w, h = core
+            x0, y0 = max(0, x - overlap), max(0, y - overlap)
+            window = (x0, y0, min(width, x + w + overlap) - x0, min(height, y + h + overlap) - y0)
+            owned, seams = [], []
+            for contour in self.find_contours_in_window(frame, prev_frame, window):
+                bx, by, bw, bh = cv2.boundingRect(contour)
+                if touches_window_edge((bx, by, bw, bh), window, (width, height)):
+                    sx, sy = max(0, bx - overlap), max(0, by - overlap)
+                    seams.append((sx, sy, min(width, bx + bw + overlap) - sx, min(height, by + bh + overlap) - sy))
+                elif x <= bx < x + w and y <= by < y + h:
+                    owned.append(contour)
+            return owned, seams
+
+        if self.tile_workers > 1:
+            results = list(self.get_tile_pool().map(detect_tile, cores))
+        else:
+            results = [detect_tile(core) for core in cores]
+
+        seams = [seam for _, tile_seams in results for seam in tile_seams]
+        covered = []
+        contours = {cv2.boundingRect(c): c for c in self.refine_windows(frame, prev_frame, seams, covered)}
+        for owned, _ in results:
+            for contour in owned:
+                rect = cv2.boundingRect(contour)
+                # Seam windows see whole blobs, so a tile blob inside one that they did
+                # not return sits in the hole of a larger blob and is not external.
+                if rect not in contours and not any(rect_inside(rect, window) for window in covered):
+                    contours[rect] = contour
+        if self.verbose:
+            print(f"Tiles: {len(cores)}, seam windows: {len(seams)}, contours: {len(contours)}")
+        return list(contours.values())
+
+    def show_preview(self, frame):
+        """Show frame in the preview, via preview_signal when running off the GUI thread."""
+        if self.preview_signal is not None:
+            self.preview_signal.emit(frame.copy())
+        else:
+            self.update_preview(frame)
 
     def update_preview(self, frame):
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -154,44 +745,345 @@ class VideoProcessor:
             print(f"Filtered fast objects: {len(filtered_fast)}")
         return filtered_fast
 
-    def draw_boxes(self, frame, boxes):
-        """Draw green rectangles around detected objects on the frame."""
+    def detect_slow_objects(self, frame, fast_positions):
+        """
+        Update the background model with the frame and return boxes around
+        foreground blobs that do not overlap a fast box.
+        """
+        scale = self.slow_scale
+        small = frame
+        if scale > 1:
+            small = cv2.resize(frame, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        fg_mask = self.fgbg.apply(small)
+        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        slow_positions = []
+        for contour in contours:
+            if cv2.contourArea(contour) * scale * scale < self.slow_min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            box = (x * scale, y * scale, w * scale, h * scale)
+            if not self.overlaps_with_slow(box, fast_positions):
+                slow_positions.append(box)
+        if self.verbose:
+            print(f"Slow objects: {len(slow_positions)}")
+        return slow_positions
+
+    def draw_boxes(self, frame, boxes, colour=(0, 255, 0)):
+        """Draw rectangles (green by default) around detected objects on the frame."""
         for (x, y, w, h) in boxes:
             if self.verbose:
-                print(f"Drawing fast box at: x={x}, y={y}, w={w}, h={h}")
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                print(f"Drawing box at: x={x}, y={y}, w={w}, h={h}")
+            cv2.rectangle(frame, (x, y), (x + w, y + h), colour, 2)
 
     def preprocess_all_frames(self, should_cancel=None):
         self.preprocessed_frames = []
         self.all_positions = []
+        self.slow_positions = []
+        self.erase_strokes = []
+        self.redo_strokes = []
+        self._current_stroke = None
+        self.preprocess_complete = False
+        self.skipped_frames = 0
+        self.classified_out = 0
+        self._classifier_queue = []
         frame_count = len(self.frames)
         frame_0 = self.frames[0].copy()  # Start with the first frame
+        # One model per run, fed incrementally below
+        self.create_background_subtractor()
+        if self.detect_slow:
+            self.detect_slow_objects(self.frames[0], [])
+        self.prepare_candidate_cache()
 
-        for i in range(1, frame_count):
+        # Slow-mover detection needs frames in order, so it keeps the sequential loop
+        if self.progressive and not self.detect_slow:
+            self.preprocess_progressive(frame_0, should_cancel)
+            return self.finish_preprocessing(frame_0)
+
+        stride = max(1, self.frame_stride)
+        prev_index = 0
+
+        while prev_index < frame_count - 1:
             if should_cancel and should_cancel():
                 break
+            i = min(prev_index + stride, frame_count - 1)
             if self.verbose:
-                print(f"Processing frame {i}/{frame_count}")
-            self.create_background_subtractor()
-            frame = self.frames[i].copy()
-            prev_frame = self.frames[i-1].copy() if i > 0 else None
-            
-            filtered_fast = self.detect_objects(frame, prev_frame)
+                print(f"Processing frame {i}/{frame_count} (stride {i - prev_index})")
+            candidates = self.pair_candidates(prev_index, i)
+            filtered_fast = self.filter_by_speed(candidates, self.prev_fast_positions or [])
+            if self.adaptive_stride:
+                speed = self.measure_speed(candidates, self.prev_fast_positions or [], i - prev_index)
+            self.prev_fast_positions = [centre for centre, _ in candidates]
+
+            # Boxes are stored against the earlier frame of the pair, as with stride 1,
+            # and frames jumped over get empty entries.
+            self.all_positions.extend([] for _ in range(prev_index - len(self.all_positions)))
             self.all_positions.append(filtered_fast)
-            self.draw_boxes(frame_0, filtered_fast)
+            if self.classifier is not None:
+                # Drawn once the batch holding them has been classified
+                self.queue_candidates(prev_index, filtered_fast, frame_0)
+            else:
+                self.draw_boxes(frame_0, filtered_fast)
+
+            if self.detect_slow:
+                # Slow boxes describe frame i itself, so they are indexed by frame
+                slow = self.detect_slow_objects(self.frames[i], filtered_fast)
+                self.slow_positions.extend([] for _ in range(i - len(self.slow_positions)))
+                self.slow_positions.append(slow)
+                self.draw_boxes(frame_0, slow, (0, 0, 255))
+
+            if self.adaptive_stride:
+                stride = self.next_stride(stride, speed)
+            prev_index = i
 
             if self.progress_signal:
                 progress = int((i + 1) / frame_count * 100)
                 self.progress_signal.emit(progress)
+        else:
+            self.all_positions.extend([] for _ in range(frame_count - 1 - len(self.all_positions)))
+            if self.detect_slow:
+                self.slow_positions.extend([] for _ in range(frame_count - len(self.slow_positions)))
+            self.preprocess_complete = True
+        return self.finish_preprocessing(frame_0)
+
+    def finish_preprocessing(self, frame_0):
+        # The pool only lives for one run, so its threads do not outlast it
+        self.shutdown_tile_pool()
+        if self.classifier is not None:
+            self.flush_candidates(frame_0)
 
         self.preprocessed_frames.append(frame_0)
         if self.verbose:
             print("Preprocessing completed.")
+            print(f"Idle frame pairs skipped: {self.skipped_frames}")
+            print(f"Boxes rejected by classifier: {self.classified_out}")
             print(f"Frames after preprocessing: {len(self.frames)}")
             print(f"Preprocessed frames: {len(self.preprocessed_frames)}")
-        self.update_preview(frame_0)
+        self.show_preview(frame_0)
         return self.preprocessed_frames
 
+    def preprocess_progressive(self, frame_0, should_cancel=None):
+        """
+        Detect fast objects visiting frame pairs coarse to fine: every
+        progressive_start-th pair, then the pairs halfway between, and so on, with
+        a preview update after each pass. Each pair is scored against the
+        candidates of the pair before it, so the final boxes match a sequential
+        run. Cancelling keeps the pairs done so far. Stride is not applied in
+        this mode.
+        """
+        pair_count = len(self.frames) - 1
+        self.all_positions = [[] for _ in range(pair_count)]
+        done = np.zeros(pair_count, dtype=bool)
+        candidates = {}
+
+        def pair_candidates(j):
+            # Each pair is looked up twice, as itself and as the next pair's predecessor
+            if j not in candidates:
+                candidates[j] = self.pair_candidates(j, j + 1)
+            return candidates[j]
+
+        step = max(1, self.progressive_start)
+        while step >= 1:
+            for j in range(0, pair_count, step):
+                if done[j]:
+                    continue
+                if should_cancel and should_cancel():
+                    return
+                if j == 0:
+                    prev_centres = self.prev_fast_positions or []
+                else:
+                    prev_centres = [centre for centre, _ in pair_candidates(j - 1)]
+                boxes = self.filter_by_speed(pair_candidates(j), prev_centres)
+                self.all_positions[j] = boxes
+                if self.classifier is not None:
+                    self.queue_candidates(j, boxes, frame_0)
+                else:
+                    self.draw_boxes(frame_0, boxes)
+                done[j] = True
+
+                if self.progress_signal:
+                    self.progress_signal.emit(int(done.sum() / pair_count * 100))
+            if self.verbose:
+                print(f"Progressive pass with step {step} done")
+            if step > 1 and (self.preview_signal is not None or self.preview_label is not None):
+                self.show_preview(frame_0)
+            step //= 2
+
+        self.prev_fast_positions = [centre for centre, _ in pair_candidates(pair_count - 1)] if pair_count else []
+        self.preprocess_complete = True
+
+    def queue_candidates(self, index, boxes, frame_0):
+        """Queue the boxes stored at all_positions[index] for classification."""
+        self._classifier_queue.extend((index, box) for box in boxes)
+        if len(self._classifier_queue) >= self.classifier_batch_size:
+            self.flush_candidates(frame_0)
+
+    def flush_candidates(self, frame_0):
+        """
+        Score every queued candidate in one classifier call, drop the boxes scoring
+        below classifier_threshold and draw the rest on frame_0. filter_by_speed
+        can store the same box several times, so each distinct box is scored once.
+        """
+        queue, self._classifier_queue = self._classifier_queue, []
+        if not queue:
+            return
+        unique = list(dict.fromkeys(queue))
+        size = self.classifier.crop_size
+        crops = np.empty((len(unique), size, size, 3), dtype=np.uint8)
+        for n, (index, (x, y, w, h)) in enumerate(unique):
+            cv2.resize(self.frames[index][y:y + h, x:x + w], (size, size), dst=crops[n], interpolation=cv2.INTER_AREA)
+        scores = dict(zip(unique, self.classifier.score(crops)))
+
+        for index, box in queue:
+            if scores[index, box] < self.classifier_threshold:
+                self.all_positions[index].remove(box)
+                self.classified_out += 1
+            else:
+                self.draw_boxes(frame_0, [box])
+        if self.verbose:
+            print(f"Classified {len(unique)} distinct candidates, rejected so far: {self.classified_out}")
+
+    def pace_frames(self, frame_queue, stop_event):
+        """
+        Producer for run_realtime: release frames at the source frame rate, the
+        way a capture device would. A live source cannot wait for a slow
+        consumer, so frames that find the queue full are lost. The end marker
+        carries the overflow count and any error raised while reading frames.
+        """
+        interval = 1.0 / (self.fps or 30)
+        start = time.perf_counter()
+        overflow = 0
+        error = None
+        try:
+            for index, frame in enumerate(self.iter_frames()):
+                if stop_event.is_set():
+                    break
+                delay = start + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    frame_queue.put_nowait((index, frame.copy(), time.perf_counter()))
+                except queue.Full:
+                    overflow += 1
+        except Exception as e:
+            error = e
+        finally:
+            frame_queue.put((None, overflow, error))
+
+    def run_realtime(self, should_cancel=None, on_result=None):
+        """
+        Detect fast objects live while the video is replayed at its own frame rate.
+        Each detection is compared with the last processed frame, and on_result is
+        called with (frame index, boxes). Returns achieved fps, drop counts and
+        end-to-end latency percentiles in milliseconds, also kept in realtime_stats.
+        """
+        if self.drop_policy not in ('skip', 'degrade'):
+            raise ValueError(f"Unknown drop_policy {self.drop_policy!r}, expected 'skip' or 'degrade'")
+        frame_queue = queue.Queue(maxsize=self.realtime_queue_size)
+        stop_event = threading.Event()
+        producer = threading.Thread(target=self.pace_frames, args=(frame_queue, stop_event), daemon=True)
+
+        self.prev_fast_positions = []
+        prev_frame = None
+        latencies = []
+        processed = dropped = degraded = overflow = 0
+        error = None
+        start = time.perf_counter()
+        producer.start()
+        try:
+            while True:
+                try:
+                    index, frame, captured = frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if should_cancel and should_cancel():
+                        break
+                    if producer.is_alive() or not frame_queue.empty():
+                        continue
+                    break
+                if index is None:
+                    overflow, error = frame, captured
+                    break
+                if should_cancel and should_cancel():
+                    break
+
+                late = time.perf_counter() - captured > self.latency_budget
+                if late and prev_frame is not None and self.drop_policy == 'skip':
+                    dropped += 1
+                    continue
+
+                if prev_frame is not None:
+                    if late:
+                        # Trade precision for speed until detection catches up
+                        degraded += 1
+                        proxy_scale, self.proxy_scale = self.proxy_scale, max(self.proxy_scale, self.degrade_scale)
+                        try:
+                            boxes, _, _ = self.detect_fast_objects(frame, prev_frame)
+                        finally:
+                            self.proxy_scale = proxy_scale
+                    else:
+                        boxes, _, _ = self.detect_fast_objects(frame, prev_frame)
+                    if on_result:
+                        on_result(index, boxes)
+                prev_frame = frame
+                processed += 1
+                latencies.append(time.perf_counter() - captured)
+        finally:
+            stop_event.set()
+            # Unblock a producer waiting on a full queue and let it finish
+            while producer.is_alive():
+                try:
+                    frame_queue.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            producer.join()
+            self.shutdown_tile_pool()
+        if error is not None:
+            raise error
+
+        elapsed = time.perf_counter() - start
+        latency_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+        self.realtime_stats = {
+            'processed': processed,
+            'dropped': dropped,
+            'degraded': degraded,
+            'overflow': overflow,
+            'fps': processed / elapsed if elapsed > 0 else 0.0,
+            'latency_p50': float(p50),
+            'latency_p95': float(p95),
+            'latency_p99': float(p99),
+        }
+        if self.verbose:
+            print(f"Real-time: {self.realtime_stats['fps']:.1f} fps, {dropped} dropped, {degraded} degraded, "
+                  f"{overflow} lost at the source, latency p50/p95/p99 {p50:.1f}/{p95:.1f}/{p99:.1f} ms")
+        return self.realtime_stats
+
+    def measure_speed(self, candidates, prev_centres, frames):
+        """
+        Return the per-frame displacement of the fastest candidate from its nearest
+        previous centre, None if the pair shows no motion at all, or infinity if
+        motion appears with nothing to measure it against.
+        """
+        if not candidates:
+            return None
+        if not prev_centres:
+            return float('inf')
+        centres = np.array([centre for centre, _ in candidates], dtype=float)
+        distances = np.linalg.norm(centres[:, None, :] - np.asarray(prev_centres, dtype=float)[None, :, :], axis=2)
+        return float(distances.min(axis=1).max()) / max(1, frames)
+
+    def next_stride(self, stride, speed):
+        """
+        Pick the next stride from the measured per-frame speed. The stride stays
+        below min_speed / speed, so whatever the filter would pass at stride 1 is
+        sampled at stride 1, and a wider stride never lets slower motion through.
+        Without any motion the stride doubles, up to max_stride.
+        """
+        if speed is None:
+            return min(self.max_stride, stride * 2)
+        if speed <= 0:
+            return self.max_stride
+        return max(1, min(self.max_stride, int(self.min_speed / speed)))
 
     def create_preprocessed_image(self, fast_positions, slow_positions):
         return self.draw_object_rectangles(self.frames[0], fast_positions, slow_positions)
@@ -220,26 +1112,94 @@ class VideoProcessor:
         frame = self.frames[0].copy()
         for positions in self.all_positions:
             self.draw_boxes(frame, positions)
+        for positions in self.slow_positions:
+            self.draw_boxes(frame, positions, (0, 0, 255))
         return frame
 
+    def begin_erase_stroke(self):
+        """Start grouping removals into one undoable stroke."""
+        self._current_stroke = []
+
+    def end_erase_stroke(self):
+        """Finish the current stroke and make it the latest undo step."""
+        stroke, self._current_stroke = self._current_stroke, None
+        if stroke:
+            self.erase_strokes.append(stroke)
+            self.redo_strokes = []
+
     def remove_boxes_at(self, x, y, radius=0):
         """Remove any bounding box intersecting the circle centred at (x, y)."""
-        removed = False
-        for positions in self.all_positions:
-            for box in positions[:]:
+        in_stroke = self._current_stroke is not None
+        if not in_stroke:
+            self.begin_erase_stroke()
+        stroke = self._current_stroke
+        removed = []
+        for frame_index, positions in enumerate(self.all_positions):
+            kept = []
+            for box in positions:
                 bx, by, bw, bh = box
                 dx = max(bx - x, 0, x - (bx + bw))
                 dy = max(by - y, 0, y - (by + bh))
                 if dx * dx + dy * dy <= radius * radius:
-                    positions.remove(box)
-                    removed = True
+                    # The slot is where the box sits at removal time, so replaying
+                    # deltas backwards with insert() restores the original order
+                    stroke.append((frame_index, len(kept), box))
+                    removed.append(box)
+                else:
+                    kept.append(box)
+            if len(kept) != len(positions):
+                positions[:] = kept
+        if not in_stroke:
+            self.end_erase_stroke()
 
         if removed:
-            updated = self.render_preprocessed_preview()
-            if self.preprocessed_frames:
-                self.preprocessed_frames[0] = updated
-            else:
-                self.preprocessed_frames = [updated]
-            if self.preview_label is not None:
-                self.update_preview(updated)
+            self.redraw_preview_regions(removed)
+
+    def undo_erase(self):
+        """Restore the boxes removed by the latest stroke. Returns False if there is nothing to undo."""
+        if not self.erase_strokes:
+            return False
+        stroke = self.erase_strokes.pop()
+        for frame_index, slot, box in reversed(stroke):
+            self.all_positions[frame_index].insert(slot, box)
+        self.redo_strokes.append(stroke)
+        self.redraw_preview_regions([box for _, _, box in stroke])
+        return True
+
+    def redo_erase(self):
+        """Remove the boxes of the latest undone stroke again. Returns False if there is nothing to redo."""
+        if not self.redo_strokes:
+            return False
+        stroke = self.redo_strokes.pop()
+        for frame_index, slot, box in stroke:
+            del self.all_positions[frame_index][slot]
+        self.erase_strokes.append(stroke)
+        self.redraw_preview_regions([box for _, _, box in stroke])
+        return True
 
+    def redraw_preview_regions(self, boxes):
+        """
+        Redraw only the parts of the preprocessed preview covered by the given boxes,
+        giving the same pixels as render_preprocessed_preview without a full redraw.
+        """
+        if not self.preprocessed_frames:
+            self.preprocessed_frames = [self.render_preprocessed_preview()]
+        else:
+            preview = self.preprocessed_frames[0]
+            height, width = preview.shape[:2]
+            pad = 2  # covers the rectangle line thickness
+            regions = merge_rects([(x - pad, y - pad, w + 2 * pad + 1, h + 2 * pad + 1) for x, y, w, h in boxes])
+            for rx, ry, rw, rh in regions:
+                x0, y0 = max(0, rx), max(0, ry)
+                x1, y1 = min(width, rx + rw), min(height, ry + rh)
+                if x0 >= x1 or y0 >= y1:
+                    continue
+                view = preview[y0:y1, x0:x1]
+                view[:] = self.frames[0][y0:y1, x0:x1]
+                for positions, colour in ((self.all_positions, (0, 255, 0)), (self.slow_positions, (0, 0, 255))):
+                    for frame_boxes in positions:
+                        for x, y, w, h in frame_boxes:
+                            if x - pad < x1 and x + w + pad >= x0 and y - pad < y1 and y + h + pad >= y0:
+                                cv2.rectangle(view, (x - x0, y - y0), (x + w - x0, y + h - y0), colour, 2)
+        if self.preview_label is not None:
+            self.update_preview(self.preprocessed_frames[0])
@@ -1,24 +1,139 @@
+import threading
+import traceback
+
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from export import save_image
+
 
 class VideoProcessingThread(QThread):
-    """Run video processing operations in a separate thread."""
+    """
+    Long-lived worker that runs video processing jobs one at a time.
+
+    submit() replaces any job still waiting with the new one and cancels the
+    running job, so a burst of requests collapses into a single run with the
+    latest parameters. finished is emitted only for jobs that were not
+    superseded; a job cancelled with cancel() still reports its partial result.
+    A job that raises emits failed instead, and the worker carries on with the
+    next job.
+    """
 
-    finished = pyqtSignal(object)
+    # Stack composite modes: stack operation and whether it is limited to boxes
+    STACK_MODES = {
+        'lighten': ('lighten', False),
+        'darken': ('darken', False),
+        'lighten_boxes': ('lighten', True),
+    }
+
+    finished = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
     progress = pyqtSignal(int)
+    preview = pyqtSignal(object)
 
-    def __init__(self, processor, mode='process', green_boxes=None, red_boxes=None):
+    def __init__(self, processor=None):
         super().__init__()
         self.processor = processor
-        self.mode = mode
-        self.green_boxes = green_boxes
-        self.red_boxes = red_boxes
+        self.mode = None
+        self.green_boxes = None
+        self.red_boxes = None
+        self.output_path = None
+        self.busy = False
+        self.superseded_jobs = 0
+        self._condition = threading.Condition()
+        self._pending = None
+        self._cancelled = False
+        self._stopping = False
+
+    def submit(self, processor, mode='process', green_boxes=None, red_boxes=None, output_path=None):
+        """Queue a job, replacing any job still waiting and cancelling the running one."""
+        with self._condition:
+            if self._pending is not None:
+                self.superseded_jobs += 1
+            self._pending = (processor, mode, green_boxes, red_boxes, output_path)
+            self._cancelled = self.busy
+            self._condition.notify()
+        if not self.isRunning():
+            self.start()
+
+    def cancel(self):
+        """Cancel the running job and drop any waiting one."""
+        with self._condition:
+            self._pending = None
+            self._cancelled = self.busy
+
+    def stop(self):
+        """Cancel everything and wait for the worker to exit."""
+        with self._condition:
+            self._pending = None
+            self._cancelled = True
+            self._stopping = True
+            self._condition.notify()
+        self.wait()
+
+    def is_cancelled(self):
+        return self._cancelled or self.isInterruptionRequested()
 
     def run(self):
-        cancel = self.isInterruptionRequested
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                self.processor, self.mode, self.green_boxes, self.red_boxes, self.output_path = self._pending
+                self._pending = None
+                self._cancelled = False
+                self.busy = True
+
+            result_image, error = None, None
+            try:
+                result_image = self.run_job()
+            except Exception as e:
+                traceback.print_exc()
+                error = str(e) or type(e).__name__
+
+            with self._condition:
+                self.busy = False
+                superseded = self._pending is not None or self._stopping
+            if superseded:
+                self.superseded_jobs += 1
+            elif error is not None:
+                self.failed.emit(self.mode, error)
+            else:
+                self.finished.emit(self.mode, result_image)
+
+    def run_job(self):
+        cancel = self.is_cancelled
         if self.mode == 'preprocess':
             result_image = self.processor.preprocess_all_frames(should_cancel=cancel)
+        elif self.mode == 'calibrate':
+            result_image = self.processor.auto_calibrate(should_cancel=cancel)
+        elif self.mode == 'trail':
+            result_image = self.processor.export_trail_video(self.output_path, should_cancel=cancel)
+        elif self.mode in self.STACK_MODES:
+            stack_mode, boxes_only = self.STACK_MODES[self.mode]
+            result_image = self.processor.stack_composite(stack_mode, boxes_only, should_cancel=cancel)
         else:
             result_image = self.processor.process_with_squares(self.green_boxes, self.red_boxes, should_cancel=cancel)
+        return result_image
+
+
+class ImageSaveThread(QThread):
+    """Encode and write an image without blocking the GUI thread."""
 
-        self.finished.emit(result_image)
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, image, path, png_compression=3):
+        super().__init__()
+        self.image = image
+        self.path = path
+        self.png_compression = png_compression
+
+    def run(self):
+        try:
+            save_image(self.path, self.image, self.png_compression)
+        except Exception as e:
+            self.failed.emit(f"Could not save {self.path}: {e}")
+            return
+        self.saved.emit(self.path)